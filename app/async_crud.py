@@ -0,0 +1,156 @@
+from decimal import Decimal
+from typing import Callable, TypeVar
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app import crud, passwords
+from app.pagination import Page, StreamedPage, stream
+from app.models import InventoryItem, Category, Supplier, User, ExchangeRate
+from app.schemas import (
+    InventoryItemCreate, InventoryItemUpdate,
+    SupplierCreate, CategoryCreate,
+    UserCreate, UserUpdate, UserPasswordUpdate
+)
+
+# Async variants of the functions in crud.py, used by the async def routes.
+# Each one runs the matching sync crud function through AsyncSession.run_sync, so the query logic
+# lives in a single place while the actual IO goes through aiosqlite instead of blocking the event loop.
+# Anything returned from here is detached from greenlet context, so relationships the caller will
+# read afterwards (e.g. in a template) have to be eager loaded up front.
+
+T = TypeVar("T")
+
+
+# runs work(session) inside crud.unit_of_work, so every crud call it makes is committed together (or not at all)
+async def run_unit_of_work(db: AsyncSession, work: Callable[[Session], T]) -> T:
+    def run(session: Session) -> T:
+        with crud.unit_of_work(session):
+            return work(session)
+    return await db.run_sync(run)
+
+
+# Inventory Item
+
+async def get_item_by_user(db: AsyncSession, item_id: int, user_id: int) -> InventoryItem | None:
+    return await db.run_sync(crud.get_item_by_user, item_id, user_id)
+
+async def create_item(db: AsyncSession, item: InventoryItemCreate) -> InventoryItem:
+    return await db.run_sync(crud.create_item, item)
+
+async def get_item(db: AsyncSession, item_id: int, options: tuple = ()) -> InventoryItem | None:
+    return await db.run_sync(crud.get_item, item_id, options)
+
+async def get_items(
+        db: AsyncSession,
+        limit: int = 10,
+        search: str | None = None,
+        category_id: int | None = None,
+        created_by: int | None = None,
+        with_suppliers: bool = False,
+        sort: str | None = None,
+        after: str | None = None,
+        before: str | None = None,
+        currency: str | None = None,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None
+    ) -> Page[InventoryItem]:
+        options = crud.LOAD_SUPPLIERS if with_suppliers else ()
+        return await db.run_sync(
+            crud.get_items, limit=limit, search=search, category_id=category_id, created_by=created_by,
+            options=options, sort=sort, after=after, before=before, currency=currency, min_price=min_price, max_price=max_price
+        )
+
+# same filters as get_items, for pages that are rendered while the rows are still being fetched (see pagination.stream).
+# db has to stay open until page.items has been consumed
+async def stream_items(
+        db: AsyncSession,
+        limit: int = 10,
+        search: str | None = None,
+        category_id: int | None = None,
+        created_by: int | None = None,
+        with_suppliers: bool = False,
+        sort: str | None = None,
+        after: str | None = None,
+        before: str | None = None,
+        currency: str | None = None,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None
+    ) -> StreamedPage[InventoryItem]:
+        query, converted_price, key, descending = await db.run_sync(
+            crud.items_query, search=search, category_id=category_id, created_by=created_by, sort=sort,
+            currency=currency, min_price=min_price, max_price=max_price
+        )
+        options = (crud.LOAD_SUPPLIERS if with_suppliers else ()) + crud.price_expressions(converted_price)
+        return await stream(db, query.statement, key, descending, limit=limit, after=after, before=before, options=options)
+
+async def update_item(db: AsyncSession, db_item: InventoryItem, updates: InventoryItemUpdate) -> InventoryItem:
+    return await db.run_sync(crud.update_item, db_item, updates)
+
+async def delete_item(db: AsyncSession, item_id: int) -> InventoryItem | None:
+    return await db.run_sync(crud.delete_item, item_id)
+
+
+# Category
+
+async def create_category(db: AsyncSession, category: CategoryCreate) -> Category:
+    return await db.run_sync(crud.create_category, category)
+
+async def get_category(db: AsyncSession, category_id: int) -> Category | None:
+    return await db.run_sync(crud.get_category, category_id)
+
+async def get_category_by_name(db: AsyncSession, name: str) -> Category | None:
+    return await db.run_sync(crud.get_category_by_name, name)
+
+async def get_categories(db: AsyncSession, limit: int = 10, search: str | None = None, sort: str = "category_id", after: str | None = None, before: str | None = None) -> Page[Category]:
+    return await db.run_sync(crud.get_categories, limit=limit, search=search, sort=sort, after=after, before=before)
+
+
+# Supplier
+
+async def create_supplier(db: AsyncSession, supplier: SupplierCreate) -> Supplier:
+    return await db.run_sync(crud.create_supplier, supplier)
+
+async def get_supplier(db: AsyncSession, supplier_id: int) -> Supplier | None:
+    return await db.run_sync(crud.get_supplier, supplier_id)
+
+async def get_suppliers(db: AsyncSession, limit: int = 10, search: str | None = None, sort: str = "supplier_id", after: str | None = None, before: str | None = None) -> Page[Supplier]:
+    return await db.run_sync(crud.get_suppliers, limit=limit, search=search, sort=sort, after=after, before=before)
+
+
+# User
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    password_hash = await passwords.hash_password_async(user.password) # hashed on the password pool, not in run_sync on the event loop
+    return await db.run_sync(crud.create_user, user, password_hash)
+
+async def create_sso_user(db: AsyncSession, username: str, role: str) -> User:
+    return await db.run_sync(crud.create_sso_user, username, role)
+
+async def get_user(db: AsyncSession, user_id: int) -> User | None:
+    return await db.run_sync(crud.get_user, user_id)
+
+async def get_user_by_username(db: AsyncSession, username: str) -> User | None:
+    return await db.run_sync(crud.get_user_by_username, username)
+
+async def update_user(db: AsyncSession, db_user: User, updates: UserUpdate) -> User:
+    return await db.run_sync(crud.update_user, db_user, updates)
+
+async def update_user_password(db: AsyncSession, db_user: User, updates: UserPasswordUpdate) -> User:
+    if not (await passwords.verify_password_async(updates.old_password, db_user.password))[0]:
+        raise ValueError("Incorrect old password")
+    password_hash = await passwords.hash_password_async(updates.new_password)
+    return await db.run_sync(crud.set_password_hash, db_user, password_hash)
+
+async def set_password_hash(db: AsyncSession, db_user: User, password_hash: str) -> User:
+    return await db.run_sync(crud.set_password_hash, db_user, password_hash)
+
+async def delete_user(db: AsyncSession, user_id: int) -> User | None:
+    return await db.run_sync(crud.delete_user, user_id)
+
+
+# Exchange rates
+
+async def get_exchange_rate(db: AsyncSession, base: str, target: str) -> ExchangeRate | None:
+    return await db.run_sync(crud.get_exchange_rate, base, target)
+
+async def replace_exchange_rates(db: AsyncSession, base: str, rates: dict[str, float]):
+    await db.run_sync(crud.replace_exchange_rates, base, rates)
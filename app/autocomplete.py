@@ -0,0 +1,115 @@
+import threading
+from bisect import bisect_left
+
+from sqlalchemy.orm import Session
+
+from app import config
+from app.database import after_commit
+from app.models import Category, Supplier, InventoryItem
+
+# In-process prefix indexes behind the /autocomplete endpoints.
+# Each index is a sorted list of (casefolded name, id, name) tuples, so a prefix lookup is a bisect plus a short
+# slice instead of a database query. Categories and suppliers are loaded at startup, a user's items are loaded the
+# first time that user asks for them. The crud write functions keep the indexes up to date once their transaction
+# commits. Being in-process, each worker has its own copy and only sees writes made through that worker.
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._entries: list[tuple[str, int, str]] = []
+        self._lock = threading.Lock()
+
+    def load(self, rows: list[tuple[int, str]]):
+        entries = sorted((name.casefold(), entry_id, name) for entry_id, name in rows if name)
+        with self._lock:
+            self._entries = entries
+
+    # adding is idempotent, so an entry that was already picked up by load() isn't duplicated
+    def add(self, entry_id: int, name: str | None):
+        if not name:
+            return
+        entry = (name.casefold(), entry_id, name)
+        with self._lock:
+            position = bisect_left(self._entries, entry)
+            if position == len(self._entries) or self._entries[position] != entry:
+                self._entries.insert(position, entry)
+
+    def remove(self, entry_id: int, name: str | None):
+        if not name:
+            return
+        entry = (name.casefold(), entry_id, name)
+        with self._lock:
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def search(self, prefix: str, limit: int = 10) -> list[dict]:
+        key = prefix.casefold()
+        matches = []
+        with self._lock:
+            position = bisect_left(self._entries, (key,))
+            for folded, entry_id, name in self._entries[position:position + limit]:
+                if not folded.startswith(key):
+                    break
+                matches.append({"id": entry_id, "name": name})
+        return matches
+
+    def all(self) -> list[dict]:
+        with self._lock:
+            return [{"id": entry_id, "name": name} for _, entry_id, name in self._entries]
+
+
+categories = PrefixIndex()
+suppliers = PrefixIndex()
+_user_items: dict[int, PrefixIndex] = {}
+_user_items_lock = threading.Lock()
+
+
+def load(db: Session):
+    categories.load(db.query(Category.category_id, Category.name).all())
+    suppliers.load(db.query(Supplier.supplier_id, Supplier.name).all())
+    with _user_items_lock:
+        _user_items.clear()
+
+# returns the user's item index, loading it from the database the first time
+def user_items(db: Session, user_id: int) -> PrefixIndex:
+    index = _user_items.get(user_id)
+    if index is None:
+        index = PrefixIndex()
+        index.load(db.query(InventoryItem.item_id, InventoryItem.name).filter(InventoryItem.created_by == user_id).all())
+        with _user_items_lock:
+            if len(_user_items) >= config.AUTOCOMPLETE_MAX_USERS:
+                _user_items.pop(next(iter(_user_items))) # forget the user that was loaded first
+            index = _user_items.setdefault(user_id, index)
+    return index
+
+# item writes only matter for users whose index is already loaded, the others are read fresh when first used
+def _loaded_user_items(user_id: int) -> PrefixIndex:
+    return _user_items.get(user_id) or PrefixIndex()
+
+
+# Hooks called by crud. They take plain values (read before the commit expires the objects) and apply after commit
+
+def category_added(db: Session, category_id: int, name: str | None):
+    after_commit(db, lambda: categories.add(category_id, name))
+
+def category_removed(db: Session, category_id: int, name: str | None):
+    after_commit(db, lambda: categories.remove(category_id, name))
+
+def supplier_added(db: Session, supplier_id: int, name: str | None):
+    after_commit(db, lambda: suppliers.add(supplier_id, name))
+
+def supplier_removed(db: Session, supplier_id: int, name: str | None):
+    after_commit(db, lambda: suppliers.remove(supplier_id, name))
+
+def item_added(db: Session, user_id: int, item_id: int, name: str | None):
+    after_commit(db, lambda: _loaded_user_items(user_id).add(item_id, name))
+
+def items_added(db: Session, items: list[tuple[int, int, str | None]]):
+    def apply():
+        for user_id, item_id, name in items:
+            _loaded_user_items(user_id).add(item_id, name)
+    after_commit(db, apply)
+
+def item_removed(db: Session, user_id: int, item_id: int, name: str | None):
+    after_commit(db, lambda: _loaded_user_items(user_id).remove(item_id, name))
@@ -0,0 +1,89 @@
+import argparse
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app import crud, fieldsets, responses, schemas
+from app.database import Base
+from app.models import Category, InventoryItem, ItemSupplier, Supplier, User
+
+# Serialization benchmark for the item read routes: one page of items from an in-memory SQLite database, built and
+# encoded the way GET /items/ used to (ORM objects with LOAD_FULL, validated through schemas.InventoryItem, encoded
+# with the stdlib json) and the way it does now (column rows into dicts by crud.get_item_rows, validated and encoded
+# through the fieldset's model by responses.model_response),
+# optionally also with a sparse fieldset (?fields=, see app/fieldsets.py).
+# `python -m app.benchmark [--items 1000] [--rounds 20] [--fields item_id,name,quantity]`
+
+_items_adapter = TypeAdapter(list[schemas.InventoryItem])
+
+
+def _seed(db: Session, items: int):
+    now = datetime.now(timezone.utc)
+    db.execute(insert(User), [{"user_id": 1, "username": "bench", "password": None, "role": "Admin", "created_at": now}])
+    db.execute(insert(Category), [{"category_id": index, "name": f"Category {index}", "description": "", "created_at": now} for index in range(1, 11)])
+    db.execute(insert(Supplier), [{"supplier_id": index, "name": f"Supplier {index}", "contact_details": "", "created_at": now} for index in range(1, 21)])
+    db.execute(insert(InventoryItem), [
+        {
+            "item_id": index, "name": f"Item {index}", "description": "benchmark item", "quantity": index % 100, "price": Decimal(index) + Decimal("0.99"),
+            "category_id": index % 10 + 1, "created_by": 1, "created_at": now, "updated_at": now,
+        }
+        for index in range(1, items + 1)
+    ])
+    db.execute(insert(ItemSupplier), [
+        {"item_id": index, "supplier_id": (index + offset) % 20 + 1, "created_at": now} for index in range(1, items + 1) for offset in range(2)
+    ])
+    db.commit()
+
+
+def _orm_page(db: Session, items: int) -> bytes:
+    page = crud.get_items(db, limit=items, options=crud.LOAD_FULL)
+    content = _items_adapter.dump_python(_items_adapter.validate_python(page.items, from_attributes=True), mode="json")
+    return JSONResponse(content).body
+
+def _row_page(db: Session, items: int, fieldset=None) -> bytes:
+    fieldset = fieldset or crud.item_fieldset()
+    page = crud.get_item_rows(db, limit=items, fieldset=fieldset)
+    return responses.model_response(fieldsets.adapter(schemas.InventoryItem, fieldset, many=True), page.items).body
+
+
+# best of rounds, in seconds. Each round has a fresh session so no ORM objects are reused from the identity map
+def _time(engine, build, items: int, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        with Session(engine) as db:
+            started = time.perf_counter()
+            build(db, items)
+            best = min(best, time.perf_counter() - started)
+    return best
+
+def run(items: int, rounds: int, fields: str | None = None) -> dict[str, float]:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        _seed(db, items)
+        # both paths have to produce the same document
+        if _items_adapter.validate_json(_orm_page(db, items)) != _items_adapter.validate_json(_row_page(db, items)):
+            raise AssertionError("The ORM and row pages differ")
+    results = {"orm": _time(engine, _orm_page, items, rounds), "rows": _time(engine, _row_page, items, rounds)}
+    if fields:
+        fieldset = crud.item_fieldset(fields)
+        results["fields"] = _time(engine, lambda db, count: _row_page(db, count, fieldset), items, rounds)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the ORM and row based item pages")
+    parser.add_argument("--items", type=int, default=1000, help="items on the page")
+    parser.add_argument("--rounds", type=int, default=20, help="best of this many runs")
+    parser.add_argument("--fields", help="also time the row page with this sparse fieldset, e.g. item_id,name,quantity")
+    args = parser.parse_args()
+
+    results = run(args.items, args.rounds, args.fields)
+    for name, seconds in results.items():
+        print(f"{name:>6}: {seconds * 1000:8.2f} ms per page, {seconds / args.items * 1e6:7.1f} µs per item, {results['orm'] / seconds:5.1f}x")
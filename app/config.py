@@ -0,0 +1,158 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Application settings, read from the environment (or the .env file) once at import time.
+# Every value has a default that works for local development.
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _get_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _get_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+# Database
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./InventoryManagement.db")
+# the async engine talks to the same database; for SQLite we just swap in the aiosqlite driver
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+
+DB_ECHO = _get_bool("DB_ECHO", False) # logs every SQL statement, useful for debugging but expensive on the hot path
+DB_POOL_SIZE = _get_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _get_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _get_int("DB_POOL_TIMEOUT", 30) # seconds to wait for a free connection before giving up
+# makes the item relationships raise instead of lazy loading, so a route that forgot its loading plan fails loudly (meant for tests)
+DB_RAISE_ON_LAZY_LOAD = _get_bool("DB_RAISE_ON_LAZY_LOAD", False)
+
+
+# Read-only connections used by list/dashboard queries, with their own pool so heavy reads never wait on writers.
+# For SQLite this defaults to the same file opened with mode=ro; for other databases point it at a replica.
+
+def _read_only_sqlite_url(url: str) -> str:
+    prefix, _, path = url.partition(":///")
+    if not path or path.startswith(":memory:") or path.startswith("file:"):
+        return url
+    return f"{prefix}:///file:{path}?mode=ro&uri=true"
+
+READ_DATABASE_URL = os.getenv(
+    "READ_DATABASE_URL",
+    _read_only_sqlite_url(DATABASE_URL) if DATABASE_URL.startswith("sqlite") else DATABASE_URL
+)
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_READ_DATABASE_URL", READ_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+
+DB_READ_POOL_SIZE = _get_int("DB_READ_POOL_SIZE", 10)
+DB_READ_MAX_OVERFLOW = _get_int("DB_READ_MAX_OVERFLOW", 20)
+
+
+# SQLite tuning, applied to every new connection
+
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL") # WAL lets readers keep going while a writer commits
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL") # safe with WAL, avoids an fsync on every commit
+SQLITE_MMAP_SIZE = _get_int("SQLITE_MMAP_SIZE", 268435456) # 256MB
+SQLITE_CACHE_SIZE = _get_int("SQLITE_CACHE_SIZE", -64000) # negative means KiB, so roughly 64MB of page cache
+SQLITE_BUSY_TIMEOUT = _get_int("SQLITE_BUSY_TIMEOUT", 5000) # milliseconds to wait on a locked database instead of failing
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT,
+    "temp_store": SQLITE_TEMP_STORE,
+}
+
+
+# Authentication
+
+PRINCIPAL_CACHE_SIZE = _get_int("PRINCIPAL_CACHE_SIZE", 1024) # signed in users kept in memory per worker, 0 disables the cache
+PRINCIPAL_CACHE_TTL_SECONDS = _get_int("PRINCIPAL_CACHE_TTL_SECONDS", 60) # how long another worker's change to a user can go unnoticed
+PASSWORD_HASH_ROUNDS = _get_int("PASSWORD_HASH_ROUNDS", 12) # bcrypt cost, users are rehashed with it as they sign in after a change
+PASSWORD_HASH_WORKERS = _get_int("PASSWORD_HASH_WORKERS", 2) # threads hashing and verifying passwords
+PASSWORD_HASH_QUEUE_LIMIT = _get_int("PASSWORD_HASH_QUEUE_LIMIT", 32) # password checks allowed to wait for a thread before sign ins get a 503
+# take the user id and role from the token instead of looking the user up. Role changes and deletions then only apply once the token expires
+AUTH_TRUST_TOKEN_CLAIMS = _get_bool("AUTH_TRUST_TOKEN_CLAIMS", False)
+
+
+# Google sign in. The URLs can point at a local stand-in of Google's endpoints for development and tests
+
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID") # required, checked in routes/auth.py
+GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+# REDIRECT_URI is the name older .env files use
+GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", os.getenv("REDIRECT_URI", "http://localhost:8500/auth/google/callback"))
+GOOGLE_AUTH_URL = os.getenv("GOOGLE_AUTH_URL", "https://accounts.google.com/o/oauth2/v2/auth")
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_JWKS_URL = os.getenv("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+# accepted "iss" values of the ID tokens, comma separated
+GOOGLE_ISSUERS = [issuer.strip() for issuer in os.getenv("GOOGLE_ISSUERS", "https://accounts.google.com,accounts.google.com").split(",") if issuer.strip()]
+GOOGLE_OAUTH_TIMEOUT = _get_float("GOOGLE_OAUTH_TIMEOUT", 5.0) # seconds allowed for a call to Google
+GOOGLE_JWKS_TTL_SECONDS = _get_int("GOOGLE_JWKS_TTL_SECONDS", 3600) # how long the signing keys are cached
+GOOGLE_JWKS_MIN_REFRESH_SECONDS = _get_int("GOOGLE_JWKS_MIN_REFRESH_SECONDS", 60) # an unknown key refetches them at most this often
+
+
+# HTTP caching. Seconds a client may reuse a GET response without revalidating it (with its ETag, see app/etags.py)
+
+ITEMS_CACHE_MAX_AGE = _get_int("ITEMS_CACHE_MAX_AGE", 0) # GET /items/ and /items/{id}
+CATALOG_CACHE_MAX_AGE = _get_int("CATALOG_CACHE_MAX_AGE", 0) # GET /categories/ and /suppliers/
+
+
+# HTML pages
+
+UI_MAX_PAGE_SIZE = _get_int("UI_MAX_PAGE_SIZE", 5000) # largest page size the inventory pages offer, they're streamed so memory stays flat
+STREAM_BATCH_SIZE = _get_int("STREAM_BATCH_SIZE", 200) # rows fetched at a time while streaming a page
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR") or None # compiled templates are kept here across restarts, defaults to a temp directory
+TEMPLATE_AUTO_RELOAD = _get_bool("TEMPLATE_AUTO_RELOAD", True) # recompile templates that changed on disk, turn off in production to skip the checks
+
+
+# Bulk import and export
+
+IMPORT_CHUNK_SIZE = _get_int("IMPORT_CHUNK_SIZE", 5000) # rows validated and inserted per transaction by POST /items/import
+EXPORT_BATCH_SIZE = _get_int("EXPORT_BATCH_SIZE", 1000) # rows fetched and written at a time by GET /items/export (a Parquet row group each)
+BATCH_MAX_OPERATIONS = _get_int("BATCH_MAX_OPERATIONS", 1000) # most operations one POST /items/batch can carry
+
+
+# Autocomplete
+
+AUTOCOMPLETE_LIMIT = _get_int("AUTOCOMPLETE_LIMIT", 10) # default number of suggestions returned
+AUTOCOMPLETE_MAX_USERS = _get_int("AUTOCOMPLETE_MAX_USERS", 1000) # how many users' item indexes are kept in memory at once
+
+
+
+# Dashboard
+
+LOW_STOCK_THRESHOLD = _get_int("LOW_STOCK_THRESHOLD", 10) # items with fewer than this many units are low on stock
+DASHBOARD_LIST_LIMIT = _get_int("DASHBOARD_LIST_LIMIT", 50) # low stock items per page of /api/dashboard/low-stock when it is paged with a cursor and no limit
+
+
+
+# Dashboard stream
+
+EVENTS_QUEUE_SIZE = _get_int("EVENTS_QUEUE_SIZE", 100) # events buffered per open stream, the oldest are dropped beyond that
+SSE_KEEPALIVE_SECONDS = _get_int("SSE_KEEPALIVE_SECONDS", 15) # comment sent on an idle stream so proxies don't close it
+
+
+
+# Exchange rates
+
+EXCHANGE_RATE_URL = os.getenv("EXCHANGE_RATE_URL", "https://api.frankfurter.app") # any Frankfurter compatible API, e.g. a local stand-in
+EXCHANGE_RATE_BASE = os.getenv("EXCHANGE_RATE_BASE", "CAD") # currency the prices are stored in, its rates are loaded at startup
+EXCHANGE_RATE_TTL_SECONDS = _get_int("EXCHANGE_RATE_TTL_SECONDS", 3600) # how often the stored rates are refreshed in the background
+EXCHANGE_RATE_TIMEOUT = _get_float("EXCHANGE_RATE_TIMEOUT", 2.0) # seconds allowed for an upstream call
+
+
+# SQL profiling
+
+SQL_PROFILING = _get_bool("SQL_PROFILING", False) # count and time the statements each request runs, reported in the Server-Timing header. Off by default, the header reveals query counts and timings
+SQL_PROFILING_REPEAT_THRESHOLD = _get_int("SQL_PROFILING_REPEAT_THRESHOLD", 5) # same statement this many times in one request is flagged as a possible N+1
+SQL_PROFILING_DEBUG = _get_bool("SQL_PROFILING_DEBUG", False) # exposes /debug/slow-routes, keep off in production
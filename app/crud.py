@@ -1,6 +1,14 @@
-from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from typing import Iterator
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import ColumnElement, insert
+from sqlalchemy.orm import Query, Session, joinedload, selectinload, with_expression
+from sqlalchemy.sql.elements import Label
+from app import config
+from app.database import begin_write
 from app.models import(
-    InventoryItem, Category, Supplier, User, ItemSupplier
+    InventoryItem, Category, Supplier, User, ItemSupplier, ExchangeRate
 )
 from app.schemas import (
     InventoryItemCreate, InventoryItemUpdate,
@@ -9,9 +17,49 @@ from app.schemas import (
     UserCreate, UserUpdate, UserPasswordUpdate
     
 )
-from passlib.context import CryptContext
+from app.pagination import Page, PaginationError, paginate, resolve_sort
+from app import search as item_search
+from app import autocomplete
+from app import summary
+from app import events
+from app import principals
+from app import passwords
+from app import etags
+from app import fieldsets
+from app import schemas
+from app.fieldsets import Fieldset
+from app.passwords import pwd_context # password hashing lives in passwords.py, kept here for existing imports
+
+
+# Unit of work: groups several crud calls into a single transaction.
+# The crud write functions below run inside one themselves, so called on their own each is still exactly one commit.
+# Wrapped in a caller's unit of work they only flush, and the caller's block commits once at the end (or rolls everything back).
+# A nested unit of work becomes a savepoint, so the caller can catch a failure in one part and keep the rest of the transaction.
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    if db.info.get("unit_of_work"):
+        with db.begin_nested():
+            yield db
+        return
+
+    db.info["unit_of_work"] = True
+    try:
+        begin_write(db) # takes SQLite's write lock up front (see database.py)
+        yield db
+        db.flush()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.info.pop("unit_of_work", None)
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto") # this is used so we can apply password hashing for more security
+# Loading plans for items. Pass the one matching what the caller is going to read as options= to get_item/get_items,
+# so relationships come back in one extra query per relationship instead of one query per item
+LOAD_CATEGORY = (joinedload(InventoryItem.category),)
+LOAD_SUPPLIERS = (selectinload(InventoryItem.suppliers).joinedload(ItemSupplier.supplier),)
+LOAD_FULL = LOAD_CATEGORY + LOAD_SUPPLIERS # everything schemas.InventoryItem serializes
 
 
 # Helper: get user by ID (prevents users from editting/deleting other users inventory values)
@@ -23,191 +71,546 @@ def get_item_by_user(db: Session, item_id: int, user_id: int) -> InventoryItem |
 
 # Inventory Item CRUD
 
-# create a new inventory item
+# create a new inventory item, along with its supplier (created if needed) and the link between them, in one transaction
 def create_item(db: Session, item: InventoryItemCreate) -> InventoryItem:
-    db_item = InventoryItem(
-        name=item.name,
-        description=item.description,
-        quantity=item.quantity,
-        price=item.price,
-        category_id=item.category_id,
-        created_by=item.created_by
-    )
-    db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
-
-    if item.supplier and item.supplier.strip():
-        # we check if the supplier already exists
-        existing_supplier = db.query(Supplier).filter(Supplier.name == item.supplier).first()
-
-        if not existing_supplier:
-            # create new supplier
-            new_supplier = Supplier(name=item.supplier, contact_details="")
-            db.add(new_supplier)
-            db.commit()
-            db.refresh(new_supplier)
-            supplier_id = new_supplier.supplier_id
-        else:
-            supplier_id = existing_supplier.supplier_id
-        
-        # create the link in ItemSupplier table
-        item_supplier_link = ItemSupplier(item_id=db_item.item_id, supplier_id=supplier_id)
-        db.add(item_supplier_link)
-        db.commit()
+    with unit_of_work(db):
+        db_item = InventoryItem(
+            name=item.name,
+            description=item.description,
+            quantity=item.quantity,
+            price=item.price,
+            category_id=item.category_id,
+            created_by=item.created_by
+        )
+        db.add(db_item)
+
+        if item.supplier and item.supplier.strip():
+            supplier = get_or_create_supplier(db, item.supplier)
+            # create the link in ItemSupplier table
+            db.add(ItemSupplier(item=db_item, supplier=supplier))
+
+        db.flush()
+        summary.item_added(db, db_item.created_by, summary.figures(db_item))
+        events.stock_changed(db, db_item.created_by, db_item.item_id, db_item.name, None, db_item.quantity)
+        autocomplete.item_added(db, db_item.created_by, db_item.item_id, db_item.name)
+        etags.bump(db, InventoryItem)
 
     return db_item
 
 # retrieve an inventory item by its id
-def get_item(db: Session, item_id: int) -> InventoryItem | None:
-    return db.query(InventoryItem).filter(InventoryItem.item_id == item_id).first() # queries the InventoryItem table where row matches with item_id
-
+def get_item(db: Session, item_id: int, options: tuple = ()) -> InventoryItem | None:
+    return db.query(InventoryItem).options(*options).filter(InventoryItem.item_id == item_id).first() # queries the InventoryItem table where row matches with item_id
+
+# {item_id: item} for those of the ids that exist, in one IN query
+def get_items_by_ids(db: Session, item_ids: set[int], options: tuple = ()) -> dict[int, InventoryItem]:
+    if not item_ids:
+        return {}
+    return {item.item_id: item for item in db.query(InventoryItem).options(*options).filter(InventoryItem.item_id.in_(item_ids))}
+
+# sorts supported by get_items, each one is backed by an index (see migrations/versions/0003).
+# When searching, "relevance" (the full-text rank) is available too and is the default
+ITEM_SORTS = {
+    "item_id": InventoryItem.item_id,
+    "name": InventoryItem.name,
+    "created_at": InventoryItem.created_at,
+    "price": InventoryItem.price, # converting doesn't change the order, so this also sorts by converted price
+}
+
+# returns one page of items. after/before are cursors from a previous page (see app/pagination.py)
+# search matches whole words or word prefixes in the name and description (see app/search.py)
 def get_items(
         db: Session, 
-        skip: int = 0, 
         limit: int = 10, 
         search: str | None = None, 
         category_id: int | None = None,
-        created_by: int | None = None
-    ) -> list[InventoryItem]:
+        created_by: int | None = None,
+        options: tuple = (),
+        sort: str | None = None,
+        after: str | None = None,
+        before: str | None = None,
+        currency: str | None = None,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None
+    ) -> Page[InventoryItem]:
+        query, converted_price, key, descending = items_query(db, search, category_id, created_by, sort, currency, min_price, max_price)
+        query = query.options(*options, *price_expressions(converted_price)) # options lets callers eager load relationships they are going to touch
+        return paginate(query, key, descending, limit=limit, after=after, before=before)
+
+# the filtered items query behind get_items (and async_crud.stream_items), before pagination.
+# Returns the query, the converted_price column expression (None without a currency), the sort key and whether it's descending
+def items_query(
+        db: Session,
+        search: str | None = None,
+        category_id: int | None = None,
+        created_by: int | None = None,
+        sort: str | None = None,
+        currency: str | None = None,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None
+    ) -> tuple[Query, ColumnElement | None, tuple, bool]:
         query = db.query(InventoryItem)
+        converted_price = None
+        sorts = ITEM_SORTS
         if search:
-            query = query.filter(InventoryItem.name.ilike(f"%{search}")) # filters item where name contains the search term or even partial matches
+            query, ranked = item_search.filter_items(db, query, search)
+            if ranked:
+                sorts = {**ITEM_SORTS, "relevance": item_search.relevance}
+        if sort is None:
+            sort = "relevance" if "relevance" in sorts else "item_id"
+        elif sort.lstrip("-") == "relevance" and "relevance" not in sorts:
+            raise PaginationError("Sorting by relevance needs a search term")
         if category_id:
             query = query.filter(InventoryItem.category_id == category_id) # filters item by the category if it is provided 
         if created_by:
             query = query.filter(InventoryItem.created_by == created_by)
-        return query.offset(skip).limit(limit).all() # skips first defined skip value records, limits the number of results and returns a list of results
+        # with a currency, each item's converted_price is computed in the SELECT from the exchange_rates row and the
+        # price range is in that currency. The range is divided by the rate rather than the price multiplied by it,
+        # so it stays a range on price that the (created_by, price) index can serve
+        rate = 1
+        if currency and currency != config.EXCHANGE_RATE_BASE:
+            query = query.join(ExchangeRate, (ExchangeRate.base == config.EXCHANGE_RATE_BASE) & (ExchangeRate.target == currency))
+            rate = ExchangeRate.rate
+        if currency:
+            converted_price = InventoryItem.price * rate
+        if min_price is not None:
+            query = query.filter(InventoryItem.price >= min_price / rate)
+        if max_price is not None:
+            query = query.filter(InventoryItem.price <= max_price / rate)
+        key, descending = resolve_sort(sort, sorts, InventoryItem.item_id)
+        return query, converted_price, key, descending
+
+# the options loading converted_price onto the items, for the expression returned by items_query
+def price_expressions(converted_price: ColumnElement | None) -> tuple:
+    return () if converted_price is None else (with_expression(InventoryItem.converted_price, converted_price),)
+
+
+# Items as plain dicts, for the JSON read routes.
+# The same items as get_items/get_item, selected as columns and turned straight into the dicts the routes validate
+# through the fieldset's model (fieldsets.projection), without building ORM objects. Only the fields of the Fieldset are
+# selected (see app/fieldsets.py): the category is joined in only when it is expanded, and the suppliers of all the
+# rows are one IN query, only when they are expanded
+ITEM_RELATIONS = ("category", "suppliers")
+CATEGORY_FIELDS = tuple(schemas.Category.model_fields)
+SUPPLIER_FIELDS = tuple(schemas.Supplier.model_fields)
+
+def item_fieldset(fields: str | None = None, expand: str | None = None) -> Fieldset:
+    return fieldsets.parse(fields, expand, schemas.InventoryItem, ITEM_RELATIONS)
+
+def category_fieldset(fields: str | None = None) -> Fieldset:
+    return fieldsets.parse(fields, None, schemas.Category)
+
+def supplier_fieldset(fields: str | None = None) -> Fieldset:
+    return fieldsets.parse(fields, None, schemas.Supplier)
+
+# the fieldset's columns of model, plus the ones the caller reads (the cursor's key, ids to look relations up by)
+def _projected(model, fieldset: Fieldset, required: tuple = ()) -> list:
+    columns = {name: getattr(model, name) for name in fieldset.fields}
+    for column in required:
+        if not isinstance(column, Label): # labelled key columns are added by paginate
+            columns.setdefault(column.key, column)
+    return list(columns.values())
+
+def _field_dicts(rows: list, fieldset: Fieldset) -> list[dict]:
+    return [{name: getattr(row, name) for name in fieldset.fields} for row in rows]
+
+# {item_id: [supplier dict]}
+def _supplier_dicts(db: Session, item_ids: list[int]) -> dict[int, list[dict]]:
+    suppliers: dict[int, list[dict]] = {}
+    if not item_ids:
+        return suppliers
+    rows = (
+        db.query(ItemSupplier.item_id, *(getattr(Supplier, name) for name in SUPPLIER_FIELDS))
+        .join(Supplier, Supplier.supplier_id == ItemSupplier.supplier_id)
+        .filter(ItemSupplier.item_id.in_(item_ids))
+        .order_by(ItemSupplier.item_id, Supplier.supplier_id)
+    )
+    for row in rows:
+        suppliers.setdefault(row.item_id, []).append({name: getattr(row, name) for name in SUPPLIER_FIELDS})
+    return suppliers
+
+def _item_dicts(db: Session, rows: list, fieldset: Fieldset) -> list[dict]:
+    items = _field_dicts(rows, fieldset)
+    if "category" in fieldset.expand:
+        for item, row in zip(items, rows):
+            item["category"] = {name: getattr(row, f"category_{name}") for name in CATEGORY_FIELDS}
+    if "suppliers" in fieldset.expand:
+        suppliers = _supplier_dicts(db, [row.item_id for row in rows])
+        for item, row in zip(items, rows):
+            item["suppliers"] = suppliers.get(row.item_id, [])
+    return items
+
+def _item_rows_query(query: Query, fieldset: Fieldset, key: tuple = ()) -> Query:
+    # item_id is always selected, the suppliers are looked up by it and it keeps the items table in the FROM of the join
+    columns = _projected(InventoryItem, fieldset, (*key, InventoryItem.item_id))
+    if "category" in fieldset.expand:
+        query = query.join(Category, Category.category_id == InventoryItem.category_id)
+        columns += [getattr(Category, name).label(f"category_{name}") for name in CATEGORY_FIELDS]
+    return query.with_entities(*columns)
+
+def get_item_row(db: Session, item_id: int, fieldset: Fieldset | None = None) -> dict | None:
+    fieldset = fieldset or item_fieldset()
+    row = _item_rows_query(db.query(InventoryItem), fieldset).filter(InventoryItem.item_id == item_id).first()
+    return _item_dicts(db, [row], fieldset)[0] if row is not None else None
+
+# get_items_by_ids returning dicts
+def get_item_rows_by_ids(db: Session, item_ids: set[int], fieldset: Fieldset | None = None) -> dict[int, dict]:
+    if not item_ids:
+        return {}
+    fieldset = fieldset or item_fieldset()
+    rows = _item_rows_query(db.query(InventoryItem), fieldset).filter(InventoryItem.item_id.in_(item_ids)).all()
+    return {row.item_id: item for row, item in zip(rows, _item_dicts(db, rows, fieldset))}
+
+# get_items returning dicts, same filters and cursors
+def get_item_rows(
+        db: Session,
+        limit: int = 10,
+        search: str | None = None,
+        category_id: int | None = None,
+        created_by: int | None = None,
+        sort: str | None = None,
+        after: str | None = None,
+        before: str | None = None,
+        currency: str | None = None,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None,
+        fieldset: Fieldset | None = None
+    ) -> Page[dict]:
+        fieldset = fieldset or item_fieldset()
+        query, _, key, descending = items_query(db, search, category_id, created_by, sort, currency, min_price, max_price)
+        page = paginate(_item_rows_query(query, fieldset, key), key, descending, limit=limit, after=after, before=before)
+        page.items = _item_dicts(db, page.items, fieldset)
+        return page
+
+
+# Exchange rates
+
+def get_exchange_rate(db: Session, base: str, target: str) -> ExchangeRate | None:
+    return db.get(ExchangeRate, (base, target))
+
+# replaces the stored rates of base with rates ({currency: rate})
+def replace_exchange_rates(db: Session, base: str, rates: dict[str, float]):
+    with unit_of_work(db):
+        db.query(ExchangeRate).filter(ExchangeRate.base == base).delete(synchronize_session=False)
+        updated_at = datetime.now(timezone.utc)
+        db.execute(insert(ExchangeRate), [
+            {"base": base, "target": target, "rate": Decimal(str(rate)), "updated_at": updated_at}
+            for target, rate in rates.items() if target != base
+        ])
 
 
 # update a specific inventory item based on provided data
 def update_item(db: Session, db_item: InventoryItem, updates: InventoryItemUpdate) -> InventoryItem:
-    update_data = updates.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_item, key, value)
-    db.commit()
-    db.refresh(db_item)
+    with unit_of_work(db):
+        update_data = updates.model_dump(exclude_unset=True)
+        if "name" in update_data and update_data["name"] != db_item.name:
+            autocomplete.item_removed(db, db_item.created_by, db_item.item_id, db_item.name)
+            autocomplete.item_added(db, db_item.created_by, db_item.item_id, update_data["name"])
+        before = summary.figures(db_item)
+        for key, value in update_data.items():
+            setattr(db_item, key, value)
+        db.flush()
+        summary.item_changed(db, db_item.created_by, before, summary.figures(db_item))
+        events.stock_changed(db, db_item.created_by, db_item.item_id, db_item.name, before[0], db_item.quantity)
+        etags.bump(db, InventoryItem)
     return db_item
 
 # delete an inventory item
 def delete_item(db: Session, item_id: int) -> InventoryItem | None:
-    db_item = get_item(db, item_id) # call get_item function and pass in db and item_id
+    db_item = get_item(db, item_id, options=LOAD_SUPPLIERS) # the delete cascades to the supplier links, see remove_item
     if db_item:
-        db.delete(db_item)
-        db.commit()
+        remove_item(db, db_item)
+    return db_item
+
+# delete an item that is already loaded. Load it with LOAD_SUPPLIERS when lazy loading is off, the cascade reads its links
+def remove_item(db: Session, db_item: InventoryItem) -> InventoryItem:
+    with unit_of_work(db):
+        autocomplete.item_removed(db, db_item.created_by, db_item.item_id, db_item.name)
+        db.delete(db_item) # its supplier links are deleted with it (see the cascade on InventoryItem.suppliers)
+        db.flush()
+        summary.item_removed(db, db_item.created_by, summary.figures(db_item))
+        events.stock_changed(db, db_item.created_by, db_item.item_id, db_item.name, db_item.quantity, None)
+        etags.bump(db, InventoryItem)
     return db_item
 
 
 # Category CRUD
 
 def create_category(db: Session, category: CategoryCreate) -> Category:
-
-    db_category = Category(**category.model_dump())
-    db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    with unit_of_work(db):
+        db_category = Category(**category.model_dump())
+        db.add(db_category)
+        db.flush()
+        autocomplete.category_added(db, db_category.category_id, db_category.name)
+        etags.bump(db, Category)
     return db_category
 
+# returns the category with this name, creating it if it doesn't exist yet
+def get_or_create_category(db: Session, name: str) -> Category:
+    return get_category_by_name(db, name) or create_category(db, CategoryCreate(name=name, description=""))
+
 def get_category(db: Session, category_id: int) -> Category | None:
     return db.query(Category).filter(Category.category_id == category_id).first()
 
-def get_categories(db: Session, skip: int = 0, limit: int = 10, search: str | None = None) -> list[Category]:
+def get_category_by_name(db: Session, name: str) -> Category | None:
+    return db.query(Category).filter(Category.name == name).first()
+
+CATEGORY_SORTS = {
+    "category_id": Category.category_id,
+    "name": Category.name,
+}
+
+def _categories_query(db: Session, search: str | None, sort: str) -> tuple[Query, tuple, bool]:
     query = db.query(Category)
     if search:
         query = query.filter(Category.name.ilike(f"{search}")) # enable category search
-    return query.offset(skip).limit(limit).all()
+    key, descending = resolve_sort(sort, CATEGORY_SORTS, Category.category_id)
+    return query, key, descending
+
+def get_categories(
+        db: Session,
+        limit: int = 10,
+        search: str | None = None,
+        sort: str = "category_id",
+        after: str | None = None,
+        before: str | None = None
+    ) -> Page[Category]:
+        query, key, descending = _categories_query(db, search, sort)
+        return paginate(query, key, descending, limit=limit, after=after, before=before)
+
+# get_categories as plain dicts of the fieldset's columns, for the JSON read route (see get_item_rows)
+def get_category_rows(
+        db: Session,
+        limit: int = 10,
+        search: str | None = None,
+        sort: str = "category_id",
+        after: str | None = None,
+        before: str | None = None,
+        fieldset: Fieldset | None = None
+    ) -> Page[dict]:
+        fieldset = fieldset or category_fieldset()
+        query, key, descending = _categories_query(db, search, sort)
+        page = paginate(query.with_entities(*_projected(Category, fieldset, key)), key, descending, limit=limit, after=after, before=before)
+        page.items = _field_dicts(page.items, fieldset)
+        return page
 
 def update_category(db: Session, db_category: Category, updates: CategoryUpdate) -> Category: 
-    update_data = updates.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_category, key, value)
-    db.commit()
-    db.refresh(db_category)
+    with unit_of_work(db):
+        update_data = updates.model_dump(exclude_unset=True)
+        if "name" in update_data and update_data["name"] != db_category.name:
+            autocomplete.category_removed(db, db_category.category_id, db_category.name)
+            autocomplete.category_added(db, db_category.category_id, update_data["name"])
+        for key, value in update_data.items():
+            setattr(db_category, key, value)
+        etags.bump(db, Category)
     return db_category
 
 def delete_category(db: Session, category_id: int) -> Category | None:
-    db_category = get_item(db, category_id)
-    if category_id:
-        db.delete(category_id)
-        db.commit()
+    db_category = get_category(db, category_id)
+    if db_category:
+        with unit_of_work(db):
+            autocomplete.category_removed(db, db_category.category_id, db_category.name)
+            db.delete(db_category)
+            etags.bump(db, Category)
     return db_category
 
 
 # Supplier CRUD
 
 def create_supplier(db: Session, supplier: SupplierCreate) -> Supplier:
-    db_supplier = Supplier(**supplier.model_dump())
-    db.add(db_supplier)
-    db.commit()
-    db.refresh(db_supplier)
+    with unit_of_work(db):
+        db_supplier = Supplier(**supplier.model_dump())
+        db.add(db_supplier)
+        db.flush()
+        autocomplete.supplier_added(db, db_supplier.supplier_id, db_supplier.name)
+        etags.bump(db, Supplier)
     return db_supplier
 
+# returns the supplier with this name, creating it if it doesn't exist yet
+def get_or_create_supplier(db: Session, name: str) -> Supplier:
+    existing_supplier = db.query(Supplier).filter(Supplier.name == name).first()
+    return existing_supplier or create_supplier(db, SupplierCreate(name=name, contact_details=""))
+
 def get_supplier(db: Session, supplier_id: int) -> Supplier | None:
     return db.query(Supplier).filter(Supplier.supplier_id == supplier_id).first()
 
-def get_suppliers(db: Session, skip: int = 0, limit: int = 10, search: str | None = None) -> list[Supplier]:
+SUPPLIER_SORTS = {
+    "supplier_id": Supplier.supplier_id,
+    "name": Supplier.name,
+}
+
+def _suppliers_query(db: Session, search: str | None, sort: str) -> tuple[Query, tuple, bool]:
     query = db.query(Supplier)
     if search:
         query = query.filter(Supplier.name.ilike(f"{search}"))
-    return query.offset(skip).limit(limit).all()
+    key, descending = resolve_sort(sort, SUPPLIER_SORTS, Supplier.supplier_id)
+    return query, key, descending
+
+def get_suppliers(
+        db: Session,
+        limit: int = 10,
+        search: str | None = None,
+        sort: str = "supplier_id",
+        after: str | None = None,
+        before: str | None = None
+    ) -> Page[Supplier]:
+        query, key, descending = _suppliers_query(db, search, sort)
+        return paginate(query, key, descending, limit=limit, after=after, before=before)
+
+# get_suppliers as plain dicts of the fieldset's columns, for the JSON read route (see get_item_rows)
+def get_supplier_rows(
+        db: Session,
+        limit: int = 10,
+        search: str | None = None,
+        sort: str = "supplier_id",
+        after: str | None = None,
+        before: str | None = None,
+        fieldset: Fieldset | None = None
+    ) -> Page[dict]:
+        fieldset = fieldset or supplier_fieldset()
+        query, key, descending = _suppliers_query(db, search, sort)
+        page = paginate(query.with_entities(*_projected(Supplier, fieldset, key)), key, descending, limit=limit, after=after, before=before)
+        page.items = _field_dicts(page.items, fieldset)
+        return page
 
 
 def update_supplier(db: Session, db_supplier: Supplier, updates: SupplierUpdate) -> Supplier:
-    update_data = updates.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_supplier,key, value)
-    db.commit()
-    db.refresh(db_supplier)
+    with unit_of_work(db):
+        update_data = updates.model_dump(exclude_unset=True)
+        if "name" in update_data and update_data["name"] != db_supplier.name:
+            autocomplete.supplier_removed(db, db_supplier.supplier_id, db_supplier.name)
+            autocomplete.supplier_added(db, db_supplier.supplier_id, update_data["name"])
+        for key, value in update_data.items():
+            setattr(db_supplier,key, value)
+        etags.bump(db, Supplier)
     return db_supplier
 
 def delete_supplier(db: Session, supplier_id: int) -> Supplier | None:
     db_supplier = get_supplier(db, supplier_id)
     if db_supplier:
-        db.delete(db_supplier)
-        db.commit()
+        with unit_of_work(db):
+            autocomplete.supplier_removed(db, db_supplier.supplier_id, db_supplier.name)
+            db.delete(db_supplier)
+            etags.bump(db, Supplier)
     return db_supplier
 
 
 # User CRUD
 
-def create_user(db: Session, user: UserCreate) -> User:
-    hashed_password = pwd_context.hash(user.password)
+# password_hash lets async callers hash off the event loop beforehand (see async_crud.create_user)
+def create_user(db: Session, user: UserCreate, password_hash: str | None = None) -> User:
+    hashed_password = password_hash or passwords.hash_password(user.password)
     user_data = user.model_dump()
     user_data["password"] = hashed_password
-    db_user = User(**user_data)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    with unit_of_work(db):
+        db_user = User(**user_data)
+        db.add(db_user)
     return db_user   
 
+# an account that signs in through an external provider only, it has no password so password sign in never succeeds
+def create_sso_user(db: Session, username: str, role: str) -> User:
+    with unit_of_work(db):
+        db_user = User(username=username, password=None, role=role)
+        db.add(db_user)
+    return db_user
+
 def get_user(db: Session, user_id: int) -> User | None:
     return db.query(User).filter(User.user_id == user_id).first()
 
+def get_user_by_username(db: Session, username: str) -> User | None:
+    return db.query(User).filter(User.username == username).first()
+
 def update_user(db: Session, db_user: User, updates: UserUpdate) -> User:
-    update_data = updates.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_user, key, value)
-    db.commit()
-    db.refresh(db_user)
+    with unit_of_work(db):
+        previous_username = db_user.username
+        update_data = updates.model_dump(exclude_unset=True)
+        for key, value in update_data.items():
+            setattr(db_user, key, value)
+        principals.user_changed(db, previous_username, db_user.username)
     return db_user
 
 def update_user_password(db: Session, db_user: User, updates: UserPasswordUpdate) -> User:
     # we first need to check that the old password matches correctly
-    if not pwd_context.verify(updates.old_password, db_user.password):
+    if not passwords.verify_password(updates.old_password, db_user.password)[0]:
         raise ValueError("Incorrect old password")
     
     # we hash the new password and update it
-    new_hashed = pwd_context.hash(updates.new_password)
-    db_user.password = new_hashed
-    db.commit()
-    db.refresh(db_user)
+    return set_password_hash(db, db_user, passwords.hash_password(updates.new_password))
+
+# stores an already hashed password, e.g. a rehash with the current cost after a successful sign in
+def set_password_hash(db: Session, db_user: User, password_hash: str) -> User:
+    with unit_of_work(db):
+        db_user.password = password_hash
+        principals.user_changed(db, db_user.username)
     return db_user
 
 def delete_user(db: Session, user_id: int) -> User | None:
     db_user = get_user(db, user_id)
     if db_user:
-        db.delete(db_user)
-        db.commit()
+        with unit_of_work(db):
+            summary.user_removed(db, db_user.user_id)
+            db.delete(db_user)
+            principals.user_changed(db, db_user.username)
     return db_user
 
 
+# Bulk helpers (used by the item import). These only flush, so call them inside a unit_of_work
+
+# returns {name: category_id} for the given names, inserting any categories that don't exist yet
+def get_or_create_categories(db: Session, names: set[str]) -> dict[str, int]:
+    if not names:
+        return {}
+    found = dict(db.query(Category.name, Category.category_id).filter(Category.name.in_(names)).all())
+    missing = [{"name": name, "description": ""} for name in names if name not in found]
+    if missing:
+        created = db.execute(
+            insert(Category).returning(Category.name, Category.category_id), missing # rows carry their name, so order doesn't matter
+        )
+        created = dict(created.all())
+        for name, category_id in created.items():
+            autocomplete.category_added(db, category_id, name)
+        etags.bump(db, Category)
+        found.update(created)
+    return found
+
+# returns {name: supplier_id} for the given names, inserting any suppliers that don't exist yet
+def get_or_create_suppliers(db: Session, names: set[str]) -> dict[str, int]:
+    if not names:
+        return {}
+    found = dict(db.query(Supplier.name, Supplier.supplier_id).filter(Supplier.name.in_(names)).all())
+    missing = [{"name": name, "contact_details": ""} for name in names if name not in found]
+    if missing:
+        created = db.execute(
+            insert(Supplier).returning(Supplier.name, Supplier.supplier_id), missing
+        )
+        created = dict(created.all())
+        for name, supplier_id in created.items():
+            autocomplete.supplier_added(db, supplier_id, name)
+        etags.bump(db, Supplier)
+        found.update(created)
+    return found
+
+# inserts many items (and their supplier links) with one executemany per table. category_id must already be resolved
+def bulk_create_items(db: Session, items: list[InventoryItemCreate]) -> list[int]:
+    if not items:
+        return []
+    supplier_ids = get_or_create_suppliers(db, {item.supplier.strip() for item in items if item.supplier and item.supplier.strip()})
+    result = db.execute(
+        insert(InventoryItem).returning(InventoryItem.item_id),
+        [item.model_dump(exclude={"supplier", "category"}) for item in items] # category only exists on import rows
+    )
+    # sort_by_parameter_order would make SQLite insert row by row. The rows of a multi-row INSERT get increasing ids
+    # in the order they're listed, so sorting the returned ids puts them back in parameter order
+    item_ids = sorted(result.scalars())
+    summary.items_added(db, [(item.created_by, summary.figures(item)) for item in items])
+    for item_id, item in zip(item_ids, items):
+        events.stock_changed(db, item.created_by, item_id, item.name, None, item.quantity)
+    autocomplete.items_added(db, [(item.created_by, item_id, item.name) for item_id, item in zip(item_ids, items)])
+    links = [
+        {"item_id": item_id, "supplier_id": supplier_ids[item.supplier.strip()]}
+        for item_id, item in zip(item_ids, items)
+        if item.supplier and item.supplier.strip()
+    ]
+    if links:
+        db.execute(insert(ItemSupplier), links)
+    etags.bump(db, InventoryItem)
+    return item_ids
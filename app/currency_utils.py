@@ -1,8 +1,93 @@
+import asyncio
+import logging
+from typing import Protocol
+
 import httpx
 
-async def get_exchange_rate(base: str = "CAD", target: str = "USD"):
-    url = f"https://api.frankfurter.app/latest?from={base}&to={target}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        data = response.json()
-        return data["rates"][target]
\ No newline at end of file
+from app import async_crud, config
+from app.database import AsyncSessionLocal
+
+# Exchange rates for displaying prices in other currencies.
+# refresh_rates_periodically() (started in main.py) fetches all the rates of the base currency in one upstream call
+# and stores them in the exchange_rates table, where crud.get_items converts, sorts and filters prices in SQL. Calls go
+# through one pooled client with a strict timeout, and a failed refresh keeps the rates that were stored last.
+# The upstream is a pluggable backend, see set_backend().
+
+logger = logging.getLogger(__name__)
+
+
+class RateBackend(Protocol):
+    # returns {currency: rate} for one unit of base
+    async def fetch(self, client: httpx.AsyncClient, base: str) -> dict[str, float]: ...
+
+
+class FrankfurterBackend:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+
+    async def fetch(self, client: httpx.AsyncClient, base: str) -> dict[str, float]:
+        response = await client.get(f"{self.url}/latest", params={"from": base})
+        response.raise_for_status()
+        return response.json()["rates"]
+
+
+# fixed rates, for tests and offline development
+class StaticBackend:
+    def __init__(self, rates: dict[str, dict[str, float]]):
+        self.rates = rates
+
+    async def fetch(self, client: httpx.AsyncClient, base: str) -> dict[str, float]:
+        return self.rates[base]
+
+
+class RateProvider:
+    def __init__(self, backend: RateBackend):
+        self.backend = backend
+        self._client: httpx.AsyncClient | None = None
+
+    # created on first use so it belongs to the running event loop, and reused for every call after that
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(config.EXCHANGE_RATE_TIMEOUT),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._client
+
+    # {currency: rate} for one unit of base, base included
+    async def fetch(self, base: str) -> dict[str, float]:
+        rates = await asyncio.wait_for(self.backend.fetch(self._get_client(), base), config.EXCHANGE_RATE_TIMEOUT)
+        return {**rates, base: 1.0}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+provider = RateProvider(FrankfurterBackend(config.EXCHANGE_RATE_URL))
+
+# swaps the upstream, e.g. set_backend(StaticBackend({"CAD": {"USD": 0.73}})) in tests
+def set_backend(backend: RateBackend):
+    provider.backend = backend
+
+
+# Rates table
+
+# fetches the rates of base and replaces the stored ones with them, returns how many were stored
+async def store_rates(base: str) -> int:
+    rates = {target: rate for target, rate in (await provider.fetch(base)).items() if target != base}
+    async with AsyncSessionLocal() as db:
+        await async_crud.replace_exchange_rates(db, base, rates)
+    return len(rates)
+
+# runs for the lifetime of the app. A failed refresh keeps the stored rates and is retried sooner than a successful one
+async def refresh_rates_periodically(base: str):
+    while True:
+        try:
+            await store_rates(base)
+            delay = config.EXCHANGE_RATE_TTL_SECONDS
+        except Exception:
+            logger.warning("Refreshing the %s exchange rates failed, keeping the stored ones", base, exc_info=True)
+            delay = min(60, config.EXCHANGE_RATE_TTL_SECONDS)
+        await asyncio.sleep(delay)
@@ -0,0 +1,145 @@
+from sqlalchemy import case, desc, func
+from sqlalchemy.orm import Session
+
+from app import config
+from app.pagination import Page, paginate
+from app.models import Category, InventoryItem, InventorySummary, ItemSupplier, Supplier
+
+# Dashboard panels, shared by the /dashboard page and the /api/dashboard endpoints.
+# The totals, price histogram and category counts come from the user's row in inventory_summaries (see summary.py),
+# a primary key lookup. Users without a row yet, and the remaining panels, are one aggregate (or LIMITed) query over
+# the user's items, so the work happens in the database and only the panel results come back. Functions take a sync
+# Session, the async routes call them through AsyncSession.run_sync.
+
+PRICE_RANGES = ["0–50", "51–100", "101–200", "201–500", "500+"]
+PRICE_BUCKET_BOUNDS = [50, 100, 200, 500] # upper bound (inclusive) of every range but the last
+PRICE_BUCKET = case(
+    *((InventoryItem.price <= upper, index) for index, upper in enumerate(PRICE_BUCKET_BOUNDS)),
+    else_=len(PRICE_BUCKET_BOUNDS),
+)
+
+
+# (total inventory value, number of items)
+def totals(db: Session, user_id: int) -> tuple[float, int]:
+    total_value, total_items = db.query(
+        func.coalesce(func.sum(InventoryItem.quantity * InventoryItem.price), 0),
+        func.count(InventoryItem.item_id),
+    ).filter(InventoryItem.created_by == user_id).one()
+    return float(total_value), total_items
+
+# [(category name, item count)], largest first
+def category_counts(db: Session, user_id: int) -> list[tuple[str, int]]:
+    count = func.count(InventoryItem.item_id)
+    rows = (
+        db.query(Category.name, count)
+        .select_from(InventoryItem)
+        .outerjoin(Category, Category.category_id == InventoryItem.category_id)
+        .filter(InventoryItem.created_by == user_id)
+        .group_by(InventoryItem.category_id, Category.name)
+        .order_by(count.desc(), Category.name)
+        .all()
+    )
+    return [(name or "uncategorized", total) for name, total in rows]
+
+def low_stock_count(db: Session, user_id: int) -> int:
+    return db.query(func.count(InventoryItem.item_id)).filter(
+        InventoryItem.created_by == user_id, InventoryItem.quantity < config.LOW_STOCK_THRESHOLD
+    ).scalar()
+
+# item count per PRICE_RANGES bucket
+def price_counts(db: Session, user_id: int) -> list[int]:
+    bucket = PRICE_BUCKET.label("bucket")
+    counts = [0] * len(PRICE_RANGES)
+    rows = db.query(bucket, func.count(InventoryItem.item_id)).filter(InventoryItem.created_by == user_id).group_by(bucket).all()
+    for index, total in rows:
+        counts[index] = total
+    return counts
+
+# rows with name and quantity, lowest stock first. Every low stock item, the dashboard lists them all
+def low_stock_items(db: Session, user_id: int):
+    return _low_stock_query(db, user_id).order_by(InventoryItem.quantity, InventoryItem.item_id).all()
+
+# the same rows a page at a time, with the keyset cursors of pagination.py
+def low_stock_page(db: Session, user_id: int, limit: int, after: str | None = None, before: str | None = None) -> Page:
+    return paginate(_low_stock_query(db, user_id), (InventoryItem.quantity, InventoryItem.item_id), limit=limit, after=after, before=before)
+
+def _low_stock_query(db: Session, user_id: int):
+    return db.query(InventoryItem.item_id, InventoryItem.name, InventoryItem.quantity).filter(
+        InventoryItem.created_by == user_id, InventoryItem.quantity < config.LOW_STOCK_THRESHOLD
+    )
+
+# rows with name, quantity, price and created_at, newest first
+def recent_items(db: Session, user_id: int, limit: int = 5):
+    return (
+        db.query(InventoryItem.item_id, InventoryItem.name, InventoryItem.quantity, InventoryItem.price, InventoryItem.created_at)
+        .filter(InventoryItem.created_by == user_id)
+        .order_by(desc(InventoryItem.created_at), desc(InventoryItem.item_id))
+        .limit(limit)
+        .all()
+    )
+
+# {"unique_suppliers": n, "top_suppliers": [(supplier name, item count)]}. Each item counts for its first supplier
+# (its earliest link) only, items without suppliers aren't counted
+def supplier_overview(db: Session, user_id: int, top: int = 5) -> dict:
+    first_links = (
+        db.query(func.min(ItemSupplier.id).label("link_id"))
+        .join(InventoryItem, InventoryItem.item_id == ItemSupplier.item_id)
+        .filter(InventoryItem.created_by == user_id)
+        .group_by(ItemSupplier.item_id)
+        .subquery()
+    )
+    linked = db.query(ItemSupplier.supplier_id).join(first_links, first_links.c.link_id == ItemSupplier.id)
+    unique_suppliers = linked.with_entities(func.count(func.distinct(ItemSupplier.supplier_id))).scalar()
+    count = func.count(ItemSupplier.item_id)
+    top_suppliers = (
+        linked.join(Supplier, Supplier.supplier_id == ItemSupplier.supplier_id)
+        .with_entities(Supplier.name, count)
+        .group_by(Supplier.supplier_id, Supplier.name)
+        .order_by(count.desc(), Supplier.name)
+        .limit(top)
+        .all()
+    )
+    return {"unique_suppliers": unique_suppliers, "top_suppliers": [(name, total) for name, total in top_suppliers]}
+
+
+# the figures kept in inventory_summaries: read from the user's row, or computed live when it doesn't exist yet
+def summary(db: Session, user_id: int) -> dict:
+    row = db.get(InventorySummary, user_id)
+    if row is None:
+        total_value, item_count = totals(db, user_id)
+        return {
+            "total_inventory_value": total_value,
+            "total_items": item_count,
+            "low_stock_count": low_stock_count(db, user_id),
+            "price_counts": price_counts(db, user_id),
+            "category_counts": category_counts(db, user_id),
+        }
+
+    # the row stores category ids, their names are a primary key lookup of the categories involved
+    counts = {int(category_id) if category_id != "None" else None: count for category_id, count in row.category_counts.items()}
+    category_ids = [category_id for category_id in counts if category_id is not None]
+    names = dict(db.query(Category.category_id, Category.name).filter(Category.category_id.in_(category_ids)).all()) if category_ids else {}
+    categories = sorted(((names.get(category_id) or "uncategorized", count) for category_id, count in counts.items()), key=lambda entry: (-entry[1], entry[0]))
+    return {
+        "total_inventory_value": float(row.total_value),
+        "total_items": row.item_count,
+        "low_stock_count": row.low_stock_count,
+        "price_counts": list(row.price_counts),
+        "category_counts": categories,
+    }
+
+
+# everything the dashboard page shows
+def build(db: Session, user_id: int) -> dict:
+    figures = summary(db, user_id)
+    categories = figures["category_counts"]
+    return {
+        "total_inventory_value": figures["total_inventory_value"],
+        "category_labels": [name for name, _ in categories],
+        "category_counts": [total for _, total in categories],
+        "price_ranges": PRICE_RANGES,
+        "price_counts": figures["price_counts"],
+        "low_stock_items": low_stock_items(db, user_id),
+        "recent_items": recent_items(db, user_id),
+        "supplier_overview": supplier_overview(db, user_id),
+    }
@@ -1,13 +1,98 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from typing import Callable
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./InventoryManagement.db"
+from app import config, profiling
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, echo=True, future=True)
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+ASYNC_SQLALCHEMY_DATABASE_URL = config.ASYNC_DATABASE_URL # same database, driven through an async driver so queries don't block the event loop
+
+_is_sqlite = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+_pool_args = {
+    "pool_size": config.DB_POOL_SIZE,
+    "max_overflow": config.DB_MAX_OVERFLOW,
+    "pool_timeout": config.DB_POOL_TIMEOUT,
+    "pool_pre_ping": not _is_sqlite, # only needed for network databases that can drop idle connections
+}
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+    echo=config.DB_ECHO,
+    future=True,
+    **_pool_args
+)
+# aiosqlite defaults to NullPool (a new connection per checkout), so the queue pool is requested explicitly to reuse connections
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, echo=config.DB_ECHO, poolclass=AsyncAdaptedQueuePool, **_pool_args)
+
+# read-only engines with their own pools, used by the list and dashboard queries
+_read_pool_args = {
+    **_pool_args,
+    "pool_size": config.DB_READ_POOL_SIZE,
+    "max_overflow": config.DB_READ_MAX_OVERFLOW,
+}
+read_engine = create_engine(
+    config.READ_DATABASE_URL,
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+    echo=config.DB_ECHO,
+    future=True,
+    **_read_pool_args
+)
+async_read_engine = create_async_engine(config.ASYNC_READ_DATABASE_URL, echo=config.DB_ECHO, poolclass=AsyncAdaptedQueuePool, **_read_pool_args)
+
+
+# applies the configured pragmas to every new SQLite connection (pragmas are per connection, not per database)
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in config.SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+# pysqlite (and aiosqlite on top of it) manages transactions itself and gets SAVEPOINT wrong, which nested units of work
+# in crud.py rely on. Turning its handling off and emitting BEGIN ourselves is the fix recommended by the SQLAlchemy docs
+def _disable_driver_transactions(dbapi_connection, _connection_record):
+    dbapi_connection.isolation_level = None
+
+# Transactions start with a deferred BEGIN, which takes no lock until the first write, so plain reads on the write
+# engines never wait on writers. Write transactions (crud.unit_of_work, see begin_write) start with BEGIN IMMEDIATE
+# instead, taking the write lock up front and waiting up to busy_timeout for it: a deferred one that reads first and
+# writes later fails at once with "database is locked" when another connection committed in between, since SQLite
+# can't upgrade a read snapshot that is out of date
+def _begin_transaction(connection):
+    immediate = bool(connection.get_execution_options().get("begin_immediate"))
+    connection.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    connection.info["begin_immediate"] = immediate
+
+# journal_mode is a property of the database file and can't be changed from a read-only connection, so it is left to the writers
+def _set_sqlite_read_pragmas(dbapi_connection, _connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in config.SQLITE_PRAGMAS.items():
+        if name != "journal_mode":
+            cursor.execute(f"PRAGMA {name}={value}")
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+if _is_sqlite:
+    for write_engine in (engine, async_engine.sync_engine):
+        event.listen(write_engine, "connect", _set_sqlite_pragmas)
+        event.listen(write_engine, "connect", _disable_driver_transactions)
+        event.listen(write_engine, "begin", _begin_transaction)
+    event.listen(read_engine, "connect", _set_sqlite_read_pragmas)
+    event.listen(async_read_engine.sync_engine, "connect", _set_sqlite_read_pragmas)
+
+if config.SQL_PROFILING:
+    for profiled_engine in (engine, async_engine.sync_engine, read_engine, async_read_engine.sync_engine):
+        profiling.instrument(profiled_engine)
 
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit is off so that objects can still be read (e.g. in templates) after a commit without triggering lazy IO
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
 Base = declarative_base()
 
 def get_db():
@@ -15,4 +100,77 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# async counterpart of get_db, used by the async def routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# read-only sessions for GET routes. Writing through these fails, which keeps heavy reads off the writer pool
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+# makes the session's transaction a write transaction (see _begin_transaction). One that hasn't started yet begins with
+# BEGIN IMMEDIATE. One that has only read so far, e.g. a route looking an item up before changing it, is restarted as
+# IMMEDIATE on the same connection; the objects it loaded are kept, like they would be across a commit with expire_on_commit off
+def begin_write(db: Session):
+    if not _is_sqlite:
+        return
+    if not db.in_transaction():
+        db.connection(execution_options={"begin_immediate": True})
+        return
+    connection = db.connection()
+    if not connection.info.get("begin_immediate"):
+        connection.exec_driver_sql("COMMIT")
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        connection.info["begin_immediate"] = True
+
+
+# Post-commit hooks: lets code that keeps in-memory state derived from the database (e.g. the autocomplete index)
+# apply a change only once the transaction that made it has committed. Each callback remembers the (nested) transaction
+# it was registered in: releasing a savepoint hands its callbacks to the enclosing transaction, rolling one back drops
+# them, and they only run when the outermost transaction commits
+def after_commit(db: Session, callback: Callable[[], None]):
+    db.info.setdefault("after_commit", []).append((_current_transaction(db), callback))
+
+# the callbacks registered in the current (innermost) transaction
+def pending_after_commit(db: Session) -> list[Callable[[], None]]:
+    current = _current_transaction(db)
+    return [callback for transaction, callback in db.info.get("after_commit", []) if transaction is current]
+
+def _current_transaction(db: Session):
+    return db.get_nested_transaction() or db.get_transaction()
+
+def _run_after_commit(session: Session):
+    # SQLAlchemy also fires after_commit when a savepoint is released
+    released = session.get_nested_transaction()
+    if released is not None:
+        session.info["after_commit"] = [
+            (released.parent if transaction is released else transaction, callback)
+            for transaction, callback in session.info.get("after_commit", [])
+        ]
+        return
+    for _, callback in session.info.pop("after_commit", []):
+        callback()
+
+def _discard_after_commit(session: Session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("after_commit", None)
+        return
+    session.info["after_commit"] = [
+        (transaction, callback) for transaction, callback in session.info.get("after_commit", [])
+        if transaction is not previous_transaction
+    ]
+
+event.listen(Session, "after_commit", _run_after_commit)
+event.listen(Session, "after_soft_rollback", _discard_after_commit)
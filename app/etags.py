@@ -0,0 +1,79 @@
+import hashlib
+import json
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import Request, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models import Category, InventoryItem, Supplier, TableVersion
+
+# Conditional GET for the read endpoints.
+# Every table a response is built from has a version counter in table_versions, which the crud writes bump inside
+# their own transaction (so a rollback doesn't bump it, and every worker sees the same value). A response's ETag is a
+# hash of those versions plus what selects the rows (the path and query parameters), so it changes whenever anything
+# the response could contain changes. A request whose If-None-Match matches gets a 304 before the route runs its query.
+
+# an item response embeds its category and suppliers (the supplier links only change with their item)
+ITEM_TABLES = (InventoryItem, Category, Supplier)
+
+
+# called by crud after a write to these tables
+def bump(db: Session, *models):
+    deferred_tables = db.info.get("etags_deferred")
+    if deferred_tables is not None:
+        deferred_tables.update(models)
+        return
+    db.execute(
+        update(TableVersion)
+        .where(TableVersion.table_name.in_([model.__tablename__ for model in models]))
+        .values(version=TableVersion.version + 1)
+    )
+
+# Within deferred(), bumps are gathered and each table is bumped once on the way out, for writes that change many rows
+# one by one (item_batch.py). A write that fails afterwards may leave its bump in, which only costs clients a refetch
+@contextmanager
+def deferred(db: Session) -> Iterator[None]:
+    tables: set = set()
+    db.info["etags_deferred"] = tables
+    try:
+        yield
+    finally:
+        db.info.pop("etags_deferred", None)
+    if tables:
+        bump(db, *tables)
+
+# None when a table has no counter, its responses then aren't cacheable
+def etag(db: Session, models: tuple, *parts) -> str | None:
+    names = [model.__tablename__ for model in models]
+    versions = dict(db.query(TableVersion.table_name, TableVersion.version).filter(TableVersion.table_name.in_(names)).all())
+    if len(versions) != len(names):
+        return None
+    digest = hashlib.sha256(json.dumps([sorted(versions.items()), parts], default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def matches(request: Request, tag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison, so W/ tags from intermediaries still match
+    return header.strip() == "*" or any(candidate.strip().removeprefix("W/") == tag for candidate in header.split(","))
+
+
+# Returns a 304 response to send instead when the client's copy is current, otherwise sets the caching headers on
+# response and returns None. The versions are read before the route's query, so a write landing in between can only
+# make the ETag older than the body (costing the client one extra full response), never newer
+def check(request: Request, response: Response, db: Session, models: tuple, cache_control: str, *parts) -> Response | None:
+    tag = etag(db, models, request.url.path, sorted(request.query_params.multi_items()), *parts)
+    if tag is None:
+        return None
+    headers = {"ETag": tag, "Cache-Control": cache_control}
+    if matches(request, tag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def cache_control(max_age: int) -> str:
+    # private: the API isn't meant to be cached by shared proxies. must-revalidate: once stale, ask with the ETag
+    return f"private, max-age={max_age}, must-revalidate"
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.orm import Session
+
+from app import config
+from app.database import after_commit, pending_after_commit
+
+# In-process publish/subscribe of dashboard updates, fanned out per user to the /api/dashboard/stream connections.
+# crud and summary.py report item changes as they happen, they are gathered per transaction and published once it
+# commits (never for a rollback) as at most one "summary" and one "low_stock" event per affected user.
+# Publishing may happen on a worker thread, so events are handed to each subscriber's event loop thread-safely.
+# Being in-process, subscribers only see writes made through the same worker.
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.EVENTS_QUEUE_SIZE)
+
+    # runs on the subscriber's loop. A client that stops reading loses its oldest events rather than holding memory
+    def _put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: dict):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass # the loop is closed, the subscriber is going away
+
+
+_subscribers: dict[int, set[_Subscriber]] = {}
+_subscribers_lock = threading.Lock()
+
+
+@asynccontextmanager
+async def subscribe(user_id: int) -> AsyncIterator[asyncio.Queue]:
+    subscriber = _Subscriber(asyncio.get_running_loop())
+    with _subscribers_lock:
+        _subscribers.setdefault(user_id, set()).add(subscriber)
+    try:
+        yield subscriber.queue
+    finally:
+        with _subscribers_lock:
+            user_subscribers = _subscribers.get(user_id, set())
+            user_subscribers.discard(subscriber)
+            if not user_subscribers:
+                _subscribers.pop(user_id, None)
+
+def publish(user_id: int, event: dict):
+    with _subscribers_lock:
+        subscribers = list(_subscribers.get(user_id, ()))
+    for subscriber in subscribers:
+        subscriber.deliver(event)
+
+def has_subscribers(user_id: int) -> bool:
+    return user_id in _subscribers
+
+# an event as a server-sent event frame
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+# Changes gathered over one transaction, published by the after_commit hook
+
+class _Batch:
+    def __init__(self):
+        self.summaries: dict[int, dict] = {} # user_id -> latest figures plus the accumulated deltas
+        self.low: dict[int, dict[int, dict]] = {} # user_id -> item_id -> item now low on stock
+        self.cleared: dict[int, set[int]] = {} # user_id -> item ids no longer low on stock (restocked or deleted)
+
+    def __call__(self):
+        for user_id, figures in self.summaries.items():
+            publish(user_id, {"type": "summary", "data": figures})
+        for user_id in self.low.keys() | self.cleared.keys():
+            low, cleared = self.low.get(user_id, {}), self.cleared.get(user_id, set())
+            if low or cleared:
+                publish(user_id, {"type": "low_stock", "data": {"low": list(low.values()), "cleared": sorted(cleared)}})
+
+# the batch of the session's current (possibly nested) transaction. It is an after_commit callback, so it is dropped
+# along with the changes if that transaction rolls back
+def _batch(db: Session) -> _Batch:
+    for callback in pending_after_commit(db):
+        if isinstance(callback, _Batch):
+            return callback
+    batch = _Batch()
+    after_commit(db, batch)
+    return batch
+
+
+# Hooks called by crud and summary.py. They only take plain values, the objects are expired once the commit happens
+
+# figures is the user's summary after the change, delta what the change added to item_count, total_value and low_stock_count
+def summary_changed(db: Session, user_id: int, figures: dict, delta: dict):
+    if not has_subscribers(user_id):
+        return
+    batch = _batch(db)
+    previous = batch.summaries.get(user_id, {}).get("delta", {})
+    accumulated = {key: previous.get(key, 0) + value for key, value in delta.items()}
+    batch.summaries[user_id] = {**figures, "delta": accumulated}
+
+# quantity_before is None for a new item and quantity_after is None for a deleted one
+def stock_changed(db: Session, user_id: int, item_id: int, name: str | None, quantity_before: int | None, quantity_after: int | None):
+    if not has_subscribers(user_id):
+        return
+    threshold = config.LOW_STOCK_THRESHOLD
+    was_low = quantity_before is not None and quantity_before < threshold
+    is_low = quantity_after is not None and quantity_after < threshold
+    if not was_low and not is_low:
+        return
+    batch = _batch(db)
+    low, cleared = batch.low.setdefault(user_id, {}), batch.cleared.setdefault(user_id, set())
+    if is_low:
+        low[item_id] = {"item_id": item_id, "name": name, "quantity": quantity_after}
+        cleared.discard(item_id)
+    else:
+        low.pop(item_id, None)
+        cleared.add(item_id)
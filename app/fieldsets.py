@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from functools import cache
+from typing import Optional
+
+from pydantic import BaseModel, TypeAdapter, create_model
+
+# Sparse fieldsets for the JSON read routes.
+# ?fields=item_id,name,quantity keeps only those fields of the route's response model, and ?expand=category,suppliers
+# adds the nested objects (a relation can also just be named in fields). crud turns a Fieldset into a SELECT of only
+# those columns, plus the sort key the cursors are read from, and only joins or loads the relations that were asked
+# for. Without fields every field is returned, and without expand every relation, so plain requests are unchanged.
+# The rows are validated and serialized through a model of just the selected fields (projection), and the routes
+# declare sparse_model, the response model with every field optional, so the OpenAPI schema shows fields can be left out.
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Fieldset:
+    fields: tuple[str, ...] # the model's own fields, in response order
+    expand: frozenset[str] = frozenset() # relations to nest
+
+
+def _names(value: str) -> list[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+# fields and expand as given in the query string, checked against model. relations are the names of its nested fields
+def parse(fields: str | None, expand: str | None, model: type[BaseModel], relations: tuple[str, ...] = ()) -> Fieldset:
+    scalars = tuple(name for name in model.model_fields if name not in relations)
+    expanded = set(_names(expand)) if expand is not None else set(relations)
+    if fields is None:
+        selected = scalars
+    else:
+        names = _names(fields)
+        selected = tuple(dict.fromkeys(name for name in names if name not in relations)) # dropping repeats, keeping the order
+        expanded = {name for name in names if name in relations} | (expanded if expand is not None else set())
+
+    unknown = [name for name in selected if name not in scalars]
+    if unknown:
+        raise FieldsetError(f"Unknown fields: {', '.join(unknown)}, expected some of: {', '.join(scalars + relations)}")
+    if expand is not None and not _names(expand):
+        raise FieldsetError("expand can't be empty, leave it out to include every relation")
+    unknown = sorted(expanded - set(relations))
+    if unknown:
+        expected = f"expected some of: {', '.join(relations)}" if relations else "nothing can be expanded here"
+        raise FieldsetError(f"Unknown relations: {', '.join(unknown)}, {expected}")
+    if not selected and not expanded:
+        raise FieldsetError("fields can't be empty")
+    return Fieldset(selected, frozenset(expanded))
+
+
+# model narrowed down to the fieldset's fields and relations, with their types and constraints
+@cache
+def projection(model: type[BaseModel], fieldset: Fieldset) -> type[BaseModel]:
+    names = [*fieldset.fields, *(name for name in model.model_fields if name in fieldset.expand)]
+    return create_model(f"{model.__name__}Projection", **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in names})
+
+# validates and serializes a row (or a list of rows, many=True) of the fieldset
+@cache
+def adapter(model: type[BaseModel], fieldset: Fieldset, many: bool = False) -> TypeAdapter:
+    projected = projection(model, fieldset)
+    return TypeAdapter(list[projected] if many else projected)
+
+# model with every field optional, what the routes taking fields= can return
+@cache
+def sparse_model(model: type[BaseModel]) -> type[BaseModel]:
+    fields = {name: (Optional[field.annotation], None) for name, field in model.model_fields.items()}
+    return create_model(f"{model.__name__}Fields", __doc__=f"{model.__name__} with only the fields asked for with fields= and expand=", **fields)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+
+from app import config
+
+# Google sign in (OpenID Connect authorization code flow).
+# The callback exchanges the code for tokens and takes the user's identity from the returned ID token, verified
+# locally against Google's signing keys (JWKS), so no userinfo call is needed. The keys are fetched once and cached
+# for GOOGLE_JWKS_TTL_SECONDS; a token signed with a key we don't know yet (Google rotates them) triggers an early
+# refetch, at most once per GOOGLE_JWKS_MIN_REFRESH_SECONDS. All calls go through one pooled client with timeouts.
+# Every Google URL is configurable, so development and tests can point them at a local stand-in.
+
+
+class GoogleSignInError(Exception):
+    pass
+
+
+class GoogleOAuthClient:
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+        self._keys: dict[str, jwt.PyJWK] = {} # kid -> signing key
+        self._keys_fetched_at: float | None = None # time.monotonic() of the last fetch
+        self._keys_refresh: asyncio.Task | None = None
+
+    # created on first use so it belongs to the running event loop, and reused for every call after that
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(config.GOOGLE_OAUTH_TIMEOUT),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=5),
+            )
+        return self._client
+
+    def authorization_url(self) -> str:
+        params = {
+            "client_id": config.GOOGLE_CLIENT_ID,
+            "response_type": "code",
+            "redirect_uri": config.GOOGLE_REDIRECT_URI,
+            "scope": "openid email profile",
+        }
+        return str(httpx.URL(config.GOOGLE_AUTH_URL, params=params))
+
+    # the ID token returned for an authorization code
+    async def exchange_code(self, code: str) -> str:
+        try:
+            response = await self._get_client().post(config.GOOGLE_TOKEN_URL, data={
+                "code": code,
+                "client_id": config.GOOGLE_CLIENT_ID,
+                "client_secret": config.GOOGLE_CLIENT_SECRET,
+                "redirect_uri": config.GOOGLE_REDIRECT_URI,
+                "grant_type": "authorization_code",
+            })
+            tokens = response.json() if response.status_code == 200 else {}
+        except (httpx.HTTPError, ValueError) as e: # ValueError: the body wasn't JSON
+            raise GoogleSignInError("Failed to exchange code for token") from e
+        if not isinstance(tokens, dict) or "id_token" not in tokens:
+            raise GoogleSignInError("Failed to exchange code for token")
+        return tokens["id_token"]
+
+    async def _fetch_keys(self):
+        try:
+            response = await self._get_client().get(config.GOOGLE_JWKS_URL)
+            response.raise_for_status()
+            key_set = jwt.PyJWKSet.from_dict(response.json())
+        finally:
+            self._keys_refresh = None
+        self._keys = {key.key_id: key for key in key_set.keys}
+        self._keys_fetched_at = time.monotonic()
+
+    # concurrent callers share one fetch
+    async def _refresh_keys(self):
+        if self._keys_refresh is None:
+            self._keys_refresh = asyncio.get_running_loop().create_task(self._fetch_keys())
+        try:
+            await asyncio.shield(self._keys_refresh)
+        except (httpx.HTTPError, jwt.PyJWKError, ValueError) as e:
+            raise GoogleSignInError("Failed to fetch Google signing keys") from e
+
+    async def _signing_key(self, kid: str | None) -> jwt.PyJWK:
+        age = time.monotonic() - self._keys_fetched_at if self._keys_fetched_at is not None else None
+        if age is None or age >= config.GOOGLE_JWKS_TTL_SECONDS:
+            await self._refresh_keys()
+        elif kid not in self._keys and age >= config.GOOGLE_JWKS_MIN_REFRESH_SECONDS:
+            await self._refresh_keys() # probably signed with a key Google rotated in since our last fetch
+        if kid not in self._keys:
+            raise GoogleSignInError("ID token signed with an unknown key")
+        return self._keys[kid]
+
+    # the verified claims of an ID token issued for this app
+    async def verify_id_token(self, id_token: str) -> dict:
+        try:
+            kid = jwt.get_unverified_header(id_token).get("kid")
+        except jwt.InvalidTokenError as e:
+            raise GoogleSignInError("Malformed ID token") from e
+        key = await self._signing_key(kid)
+        try:
+            claims = jwt.decode(
+                id_token, key=key.key, algorithms=["RS256"],
+                audience=config.GOOGLE_CLIENT_ID, issuer=config.GOOGLE_ISSUERS,
+                options={"require": ["exp", "iat", "iss", "aud", "sub"]},
+            )
+        except jwt.InvalidTokenError as e:
+            raise GoogleSignInError(f"Invalid ID token: {e}") from e
+        if not claims.get("email") or not claims.get("email_verified"):
+            raise GoogleSignInError("Google account has no verified email")
+        return claims
+
+    async def aclose(self):
+        if self._keys_refresh is not None:
+            self._keys_refresh.cancel()
+            self._keys_refresh = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+client = GoogleOAuthClient()
@@ -0,0 +1,160 @@
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import crud, etags, summary
+from app.models import InventoryItem
+from app.schemas import ItemBatch, ItemBatchOperation
+
+# Multi-item reads and writes used by POST /items/batch.
+# All of it runs in one transaction. The items that updates and deletes touch are looked up with one IN query up front,
+# and the items that gets and deletes return with another. The operations then run in order: consecutive creates are
+# one multi-row insert (crud.bulk_create_items), updates and deletes go through crud one by one, each as a savepoint,
+# while the summaries and table versions are adjusted once for the whole batch (summary.deferred, etags.deferred).
+# Every result shows the item as it was at that point of the batch. Gets and deletes use the up-front rows unless the
+# batch already wrote to the item, and the items of creates and updates are read with one IN query at the end, or just
+# before a later operation changes them again.
+# An atomic batch rolls back entirely on its first failing operation (a get of a missing item included), otherwise a
+# failure only undoes that operation and the others commit together.
+
+
+class OperationFailed(Exception):
+    def __init__(self, status: int, error: str):
+        super().__init__(error)
+        self.status = status
+
+class _BatchAborted(Exception):
+    def __init__(self, index: int):
+        super().__init__(index)
+        self.index = index
+
+
+def _failure(operation: ItemBatchOperation, exc: Exception) -> dict:
+    if isinstance(exc, OperationFailed):
+        return {"op": operation.op, "status": exc.status, "item": None, "error": str(exc)}
+    return {"op": operation.op, "status": 400, "item": None, "error": f"database error: {getattr(exc, 'orig', exc)}"}
+
+def _success(operation: ItemBatchOperation, item: dict | None = None) -> dict:
+    return {"op": operation.op, "status": 201 if operation.op == "create" else 200, "item": item, "error": None}
+
+
+class _Batch:
+    def __init__(self, db: Session, batch: ItemBatch):
+        self.db = db
+        self.atomic = batch.atomic
+        self.operations = batch.operations
+        self.results: list[dict | None] = [None] * len(self.operations)
+        self.items: dict[int, InventoryItem] = {}
+        self.before: dict[int, dict] = {} # as the items were before the batch
+        self.written: set[int] = set() # items the batch has created, updated or deleted so far
+        self.deleted: set[int] = set()
+        self.pending: dict[int, list[int]] = {} # item_id -> indexes of the results still waiting for its row
+
+    # the current rows of item_ids, filling in the results waiting for them
+    def read(self, item_ids: set[int]) -> dict[int, dict]:
+        rows = crud.get_item_rows_by_ids(self.db, item_ids)
+        for item_id in item_ids:
+            for index in self.pending.pop(item_id, []):
+                self.results[index]["item"] = rows.get(item_id)
+        return rows
+
+    def wait_for(self, item_id: int, index: int):
+        self.pending.setdefault(item_id, []).append(index)
+        self.written.add(item_id)
+
+    def get(self, index: int, operation: ItemBatchOperation):
+        if operation.item_id in self.written and operation.item_id not in self.deleted:
+            self.results[index] = _success(operation)
+            self.pending.setdefault(operation.item_id, []).append(index)
+            return
+        row = None if operation.item_id in self.deleted else self.before.get(operation.item_id)
+        if row is None:
+            raise OperationFailed(404, "Item not found")
+        self.results[index] = _success(operation, row)
+
+    def update(self, index: int, operation: ItemBatchOperation):
+        db_item = self.items.get(operation.item_id)
+        if db_item is None:
+            raise OperationFailed(404, "Item not found")
+        if operation.item_id in self.pending:
+            self.read({operation.item_id}) # earlier results show the item before this change
+        crud.update_item(self.db, db_item, operation.updates)
+        self.results[index] = _success(operation)
+        self.wait_for(operation.item_id, index)
+
+    def delete(self, index: int, operation: ItemBatchOperation):
+        db_item = self.items.get(operation.item_id)
+        if db_item is None:
+            raise OperationFailed(404, "Item not found")
+        row = self.read({operation.item_id}).get(operation.item_id) if operation.item_id in self.written else self.before.get(operation.item_id)
+        crud.remove_item(self.db, db_item)
+        del self.items[operation.item_id] # later operations on it get a 404
+        self.written.add(operation.item_id)
+        self.deleted.add(operation.item_id)
+        self.results[index] = _success(operation, row)
+
+    def create(self, index: int, operation: ItemBatchOperation):
+        item_id = crud.create_item(self.db, operation.item).item_id
+        self.results[index] = _success(operation)
+        self.wait_for(item_id, index)
+
+    # runs one operation, recording its failure. Summary changes collected for a failed operation are dropped
+    def attempt(self, index: int, changes: list):
+        operation = self.operations[index]
+        mark = len(changes)
+        try:
+            getattr(self, operation.op)(index, operation)
+        except (OperationFailed, SQLAlchemyError) as e:
+            del changes[mark:]
+            self.results[index] = _failure(operation, e)
+            if self.atomic:
+                raise _BatchAborted(index)
+
+    # consecutive creates as one insert. If it fails they are retried one by one to find which one it was
+    def create_many(self, indexes: range, changes: list):
+        mark = len(changes)
+        try:
+            with crud.unit_of_work(self.db):
+                item_ids = crud.bulk_create_items(self.db, [self.operations[index].item for index in indexes])
+        except SQLAlchemyError:
+            del changes[mark:]
+            for index in indexes:
+                self.attempt(index, changes)
+            return
+        for index, item_id in zip(indexes, item_ids):
+            self.results[index] = _success(self.operations[index])
+            self.wait_for(item_id, index)
+
+    def run(self, changes: list):
+        ids = lambda *ops: {op.item_id for op in self.operations if op.op in ops}
+        self.items = crud.get_items_by_ids(self.db, ids("update", "delete"), options=crud.LOAD_SUPPLIERS)
+        self.before = crud.get_item_rows_by_ids(self.db, ids("get", "delete"))
+        index = 0
+        while index < len(self.operations):
+            end = index
+            while end < len(self.operations) and self.operations[end].op == "create":
+                end += 1
+            if end > index:
+                self.create_many(range(index, end), changes)
+                index = end
+            else:
+                self.attempt(index, changes)
+                index += 1
+        if self.pending:
+            self.read(set(self.pending))
+
+
+# returns the ItemBatchReport as a dict, and the response status: 200, or the failing operation's when an atomic batch failed
+def run_batch(db: Session, batch: ItemBatch) -> tuple[dict, int]:
+    run = _Batch(db, batch)
+    try:
+        with crud.unit_of_work(db), summary.deferred(db) as changes, etags.deferred(db):
+            run.run(changes)
+    except _BatchAborted as aborted:
+        failed = run.results[aborted.index]
+        skipped = {"status": 424, "item": None, "error": f"not applied, operation {aborted.index} failed"}
+        report = {
+            "committed": False,
+            "results": [failed if index == aborted.index else {"op": operation.op, **skipped} for index, operation in enumerate(batch.operations)],
+        }
+        return report, failed["status"]
+    return {"committed": True, "results": run.results}, 200
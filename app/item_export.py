@@ -0,0 +1,187 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator
+
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import Label
+
+from app import config, crud
+from app.models import Category, InventoryItem, ItemSupplier, Supplier
+
+# Bulk item export used by GET /items/export, the counterpart of item_import.py.
+# The matching items are read as plain column rows (no ORM objects) with their category name joined in, from a
+# server-side cursor EXPORT_BATCH_SIZE rows at a time. Each batch gets its supplier names with one IN query and is
+# written out before the next one is fetched, so the first bytes go out as soon as the query runs and memory use is
+# bounded by the batch size rather than the number of items. Parquet needs pyarrow (in requirements.txt), without it
+# that format answers 501.
+
+SUPPORTED_FORMATS = ("csv", "ndjson", "parquet")
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+SUPPLIER_SEPARATOR = "; " # between the supplier names of an item in a CSV cell
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+# the columns of every row, converted_price only when a currency was asked for
+def columns(with_converted_price: bool) -> list[str]:
+    names = ["item_id", "name", "description", "quantity", "price", "category_id", "category", "suppliers", "created_by", "created_at", "updated_at"]
+    if with_converted_price:
+        names.insert(names.index("price") + 1, "converted_price")
+    return names
+
+# the filtered, sorted items as column rows. Same filters as crud.get_items, raises PaginationError for a bad sort
+def export_statement(
+        db: Session,
+        search: str | None = None,
+        category_id: int | None = None,
+        created_by: int | None = None,
+        sort: str | None = None,
+        currency: str | None = None,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None
+    ) -> tuple[Select, list[str]]:
+        query, converted_price, key, descending = crud.items_query(db, search, category_id, created_by, sort, currency, min_price, max_price)
+        selected = [
+            InventoryItem.item_id, InventoryItem.name, InventoryItem.description, InventoryItem.quantity, InventoryItem.price,
+            InventoryItem.category_id, Category.name.label("category"), InventoryItem.created_by, InventoryItem.created_at, InventoryItem.updated_at,
+        ]
+        if converted_price is not None:
+            selected.append(converted_price.label("converted_price"))
+        ordering = [column.element if isinstance(column, Label) else column for column in key]
+        statement = (
+            query.join(Category, Category.category_id == InventoryItem.category_id)
+            .with_entities(*selected)
+            .order_by(*(column.desc() if descending else column.asc() for column in ordering))
+            .statement
+        )
+        return statement, columns(converted_price is not None)
+
+
+# {item_id: [supplier name]} for one batch of items
+def _supplier_names(db: Session, item_ids: list[int]) -> dict[int, list[str]]:
+    names: dict[int, list[str]] = {}
+    rows = (
+        db.query(ItemSupplier.item_id, Supplier.name)
+        .join(Supplier, Supplier.supplier_id == ItemSupplier.supplier_id)
+        .filter(ItemSupplier.item_id.in_(item_ids))
+        .order_by(ItemSupplier.item_id, Supplier.name)
+    )
+    for item_id, name in rows:
+        names.setdefault(item_id, []).append(name)
+    return names
+
+# yield_per makes the result fetch from a server-side cursor, partitions() hands out one fetched batch at a time
+def _batches(db: Session, statement: Select, names: list[str]) -> Iterator[list[dict]]:
+    result = db.execute(statement, execution_options={"yield_per": config.EXPORT_BATCH_SIZE})
+    for partition in result.mappings().partitions():
+        suppliers = _supplier_names(db, [row["item_id"] for row in partition])
+        yield [
+            {name: suppliers.get(row["item_id"], []) if name == "suppliers" else row[name] for name in names}
+            for row in partition
+        ]
+
+
+# Writers, each turns the batches into chunks of the file
+# datetimes are written in ISO format and Decimals as strings, like the JSON routes do
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def _write_csv(batches: Iterator[list[dict]], names: list[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names)
+    writer.writeheader()
+    yield buffer.getvalue().encode()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow({
+                name: SUPPLIER_SEPARATOR.join(value) if name == "suppliers" else value.isoformat() if isinstance(value, datetime) else value
+                for name, value in row.items()
+            })
+        yield buffer.getvalue().encode()
+
+def _write_ndjson(batches: Iterator[list[dict]], names: list[str]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(row, default=_json_default) + "\n" for row in batch).encode()
+
+
+# where the Parquet writer puts the file, handed out as it's written. The writer only appends and asks for the position
+class _ParquetSink(io.RawIOBase):
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _parquet_schema(pa, names: list[str]):
+    types = {
+        "item_id": pa.int64(), "name": pa.string(), "description": pa.string(), "quantity": pa.int64(),
+        "price": pa.float64(), "converted_price": pa.float64(), "category_id": pa.int64(), "category": pa.string(),
+        "suppliers": pa.list_(pa.string()), "created_by": pa.int64(), "created_at": pa.timestamp("us"), "updated_at": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[name]) for name in names])
+
+# one row group per batch. The footer goes out last, so a cut off download is not a readable file
+def _write_parquet(batches: Iterator[list[dict]], names: list[str]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(pa, names)
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            for row in batch:
+                for name in ("price", "converted_price"):
+                    if row.get(name) is not None:
+                        row[name] = float(row[name])
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+_WRITERS = {"csv": _write_csv, "ndjson": _write_ndjson, "parquet": _write_parquet}
+
+
+# raises ExportUnavailable when the format needs a package that isn't installed
+def check_format(fmt: str):
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet # noqa: F401
+        except ImportError as e:
+            raise ExportUnavailable("Parquet export needs the pyarrow package") from e
+
+# the file's chunks. db has to stay open until they have all been consumed
+def export_items(db: Session, statement: Select, names: list[str], fmt: str) -> Iterator[bytes]:
+    return _WRITERS[fmt](_batches(db, statement, names), names)
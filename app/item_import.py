@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import BinaryIO, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app import config, crud
+from app.schemas import InventoryItemImport, ItemImportError, ItemImportReport
+
+# Bulk item import used by POST /items/import.
+# The upload is read row by row, and each chunk of rows is validated, has its category and supplier names
+# resolved with one query each, and is inserted with executemany inside its own transaction.
+# Memory use is bounded by the chunk size rather than the size of the file.
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+
+# yields (row number, raw row) pairs. A row that can't even be parsed is yielded as an exception so it ends up in the report
+def read_rows(file: BinaryIO, fmt: str) -> Iterator[tuple[int, dict | Exception]]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, row
+    else:
+        row_number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("each line must be a JSON object")
+                yield row_number, row
+            except ValueError as e:
+                yield row_number, e
+
+
+# empty CSV cells mean "not provided", so they fall back to the schema defaults instead of failing validation
+def _clean(row: dict, default_created_by: int | None) -> dict:
+    cleaned = {key: value for key, value in row.items() if key and value not in ("", None)}
+    if "created_by" not in cleaned and default_created_by is not None:
+        cleaned["created_by"] = default_created_by
+    return cleaned
+
+def _format_errors(exc: Exception) -> list[str]:
+    if isinstance(exc, ValidationError):
+        return [f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in exc.errors()]
+    return [str(exc)]
+
+
+def _import_chunk(db: Session, chunk: list[tuple[int, dict | Exception]], default_created_by: int | None, report: ItemImportReport):
+    valid: list[tuple[int, InventoryItemImport]] = []
+    for row_number, row in chunk:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            valid.append((row_number, InventoryItemImport(**_clean(row, default_created_by))))
+        except (ValidationError, ValueError) as e:
+            report.errors.append(ItemImportError(row=row_number, errors=_format_errors(e)))
+
+    if not valid:
+        return
+
+    try:
+        with crud.unit_of_work(db):
+            category_ids = crud.get_or_create_categories(
+                db, {item.category.strip() for _, item in valid if item.category_id is None}
+            )
+            items = []
+            for _, item in valid:
+                if item.category_id is None:
+                    item.category_id = category_ids[item.category.strip()]
+                items.append(item)
+            crud.bulk_create_items(db, items)
+        report.imported += len(items)
+    except Exception as e:
+        # a database error rolls back the whole chunk, the other chunks are unaffected
+        for row_number, _ in valid:
+            report.errors.append(ItemImportError(row=row_number, errors=[f"database error: {e}"]))
+
+
+def import_items(db: Session, file: BinaryIO, fmt: str, default_created_by: int | None = None, chunk_size: int | None = None) -> ItemImportReport:
+    chunk_size = chunk_size or config.IMPORT_CHUNK_SIZE
+    report = ItemImportReport(imported=0, failed=0)
+    rows = read_rows(file, fmt)
+    while chunk := list(islice(rows, chunk_size)):
+        _import_chunk(db, chunk, default_created_by, report)
+    report.failed = len(report.errors)
+    return report
@@ -1,13 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.responses import RedirectResponse, JSONResponse
-from app.database import engine, Base
 from fastapi.staticfiles import StaticFiles
-from app.routes import items, categories, suppliers, auth, ui, oauth, api_dashboard
+from app.routes import items, categories, suppliers, auth, ui, oauth, api_dashboard, autocomplete as autocomplete_routes, debug
+from app import autocomplete, config, currency_utils, google_oauth, passwords, profiling
+from app.database import ReadSessionLocal
 
+# the database schema is managed with Alembic (see migrations/), run `alembic upgrade head` to create or update it
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Inventory Management System API")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # load the category and supplier names into the in-memory autocomplete index
+    with ReadSessionLocal() as db:
+        autocomplete.load(db)
+    # keep the exchange_rates table current in the background, the inventory page converts prices with it
+    rates_refresher = asyncio.create_task(currency_utils.refresh_rates_periodically(config.EXCHANGE_RATE_BASE))
+    yield
+    rates_refresher.cancel()
+    with suppress(asyncio.CancelledError):
+        await rates_refresher
+    await currency_utils.provider.aclose()
+    await google_oauth.client.aclose()
+
+
+app = FastAPI(title="Inventory Management System API", lifespan=lifespan)
+
+# statement counts and timings per request, reported in the Server-Timing header (see app/profiling.py)
+if config.SQL_PROFILING:
+    app.middleware("http")(profiling.profile_request)
 
 
 # global exception handler to redirect 401 errors back to the login page
@@ -17,6 +39,11 @@ async def custom_http_exception_hanlder(request: Request, exc: HTTPException):
         return RedirectResponse(url="/login")   
     return JSONResponse(status_code=exc.status_code, content={"detail" : exc.detail})
 
+# the password hashing pool is saturated (see app/passwords.py), ask the client to retry rather than queueing without bound
+@app.exception_handler(passwords.PasswordHasherBusy)
+async def password_hasher_busy_handler(_request: Request, exc: passwords.PasswordHasherBusy):
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"detail" : str(exc)}, headers={"Retry-After" : "1"})
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 app.include_router(items.router, prefix="/items", tags=["Items"])
@@ -25,4 +52,7 @@ app.include_router(suppliers.router, prefix="/suppliers", tags=["Suppliers"])
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(ui.router, prefix="", tags=["UI"])
 app.include_router(oauth.router, tags=["OAuth"])
-app.include_router(api_dashboard.router, tags=["API"])
\ No newline at end of file
+app.include_router(api_dashboard.router, tags=["API"])
+app.include_router(autocomplete_routes.router, tags=["Autocomplete"])
+if config.SQL_PROFILING and config.SQL_PROFILING_DEBUG:
+    app.include_router(debug.router, tags=["Debug"])
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime, Index, JSON
+from sqlalchemy.orm import query_expression, relationship
 from app.database import Base
+from app import config
 from datetime import datetime, timezone
 
+# loading strategy for the relationships that API responses serialize. Callers are expected to eager load them
+# (see the loading plans in crud.py); with DB_RAISE_ON_LAZY_LOAD a missed one raises instead of issuing a query per row
+SERIALIZED_RELATIONSHIP_LAZY = "raise_on_sql" if config.DB_RAISE_ON_LAZY_LOAD else "select"
+
 
 class Category(Base):
     __tablename__ = "categories"
@@ -29,9 +34,22 @@ class InventoryItem(Base):
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     # each inventory item belongs to exactly one category
-    category = relationship("Category", back_populates="items")
+    category = relationship("Category", back_populates="items", lazy=SERIALIZED_RELATIONSHIP_LAZY)
+    # price in another currency, only loaded by queries that ask for it (see crud.get_items(currency=...))
+    converted_price = query_expression()
     # many inventory items can have many suppliers (many-to-many relationship)
-    suppliers = relationship("ItemSupplier", back_populates="item")
+    suppliers = relationship("ItemSupplier", back_populates="item", cascade="all, delete-orphan", lazy=SERIALIZED_RELATIONSHIP_LAZY) # links go away with the item
+
+    # composite indexes for the per-user queries (listing, sorting, low stock, recent items, category counts, price ranges). See migrations/versions/0002, 0003 and 0006
+    __table_args__ = (
+        Index("ix_inventory_items_created_by_item_id", "created_by", "item_id"),
+        Index("ix_inventory_items_created_by_quantity", "created_by", "quantity"),
+        Index("ix_inventory_items_created_by_created_at", "created_by", "created_at"),
+        Index("ix_inventory_items_created_by_category_id", "created_by", "category_id"),
+        Index("ix_inventory_items_created_by_name", "created_by", "name"),
+        Index("ix_inventory_items_created_at", "created_at"),
+        Index("ix_inventory_items_created_by_price", "created_by", "price"),
+    )
 
 
 class Supplier(Base):
@@ -55,7 +73,45 @@ class ItemSupplier(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     item = relationship("InventoryItem", back_populates="suppliers")
-    supplier = relationship("Supplier", back_populates="items")
+    supplier = relationship("Supplier", back_populates="items", lazy=SERIALIZED_RELATIONSHIP_LAZY)
+
+    # an item is linked to a given supplier at most once
+    __table_args__ = (
+        Index("uq_item_suppliers_item_id_supplier_id", "item_id", "supplier_id", unique=True),
+        Index("ix_item_suppliers_supplier_id", "supplier_id"),
+    )
+
+
+# Latest rates against a base currency, refreshed in the background from the exchange rate provider (see currency_utils.py)
+class ExchangeRate(Base):
+    __tablename__ = "exchange_rates"
+
+    base = Column(String, primary_key=True)
+    target = Column(String, primary_key=True)
+    rate = Column(Numeric, nullable=False) # units of target per unit of base
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+# Version counter per table, bumped by the crud writes in the same transaction. The ETags of the read endpoints are
+# derived from them (see app/etags.py)
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# Materialized dashboard figures, one row per user, kept up to date by the item writes in crud.py (see app/summary.py)
+class InventorySummary(Base):
+    __tablename__ = "inventory_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    total_value = Column(Numeric, nullable=False, default=0) # sum of quantity * price
+    low_stock_count = Column(Integer, nullable=False, default=0) # items below config.LOW_STOCK_THRESHOLD
+    price_counts = Column(JSON, nullable=False) # item count per dashboard.PRICE_RANGES bucket
+    category_counts = Column(JSON, nullable=False) # {"category_id": item count}
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
 
 class User(Base):
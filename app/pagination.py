@@ -0,0 +1,212 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Generic, TypeVar
+
+from fastapi import Request, Response
+from sqlalchemy import DateTime, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import Label
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+from app import config
+
+# Keyset (cursor) pagination.
+# Pages are ordered by (sort column, primary key) and a cursor is the opaque, encoded key of the row at a page boundary.
+# "after" returns the rows that follow that key and "before" the rows that precede it, so every page is an index seek
+# rather than an OFFSET scan, and rows inserted while someone is browsing don't shift the pages they're on.
+
+T = TypeVar("T")
+
+
+class PaginationError(ValueError):
+    pass
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T] = field(default_factory=list)
+    next_cursor: str | None = None # pass as "after" to get the next page
+    prev_cursor: str | None = None # pass as "before" to get the previous page
+
+
+def encode_cursor(values: tuple) -> str:
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values], default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(token: str, columns: tuple[InstrumentedAttribute, ...]) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong number of values")
+        # turn the JSON values back into what the columns hold, so the comparison binds like the stored data
+        return tuple(
+            None if value is None
+            else datetime.fromisoformat(value) if isinstance(column.type, DateTime)
+            else column.type.python_type(value)
+            for value, column in zip(values, columns)
+        )
+    except (ValueError, TypeError, NotImplementedError) as e:
+        raise PaginationError(f"Invalid cursor: {e}") from e
+
+
+# sort is a column name, prefixed with "-" for descending order. Returns the key columns and whether the order is descending
+def resolve_sort(sort: str, sortable: dict[str, InstrumentedAttribute], id_column: InstrumentedAttribute) -> tuple[tuple[InstrumentedAttribute, ...], bool]:
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name not in sortable:
+        raise PaginationError(f"Unsupported sort '{name}', expected one of: {', '.join(sortable)}")
+    column = sortable[name]
+    key = (column,) if column is id_column else (column, id_column)
+    return key, descending
+
+
+def paginate(
+        query: Query,
+        key: tuple[InstrumentedAttribute | Label, ...],
+        descending: bool = False,
+        limit: int = 10,
+        after: str | None = None,
+        before: str | None = None
+    ) -> Page:
+        # the rows are either one entity each or plain column rows, which have to include the key columns
+        entity_rows = isinstance(query.column_descriptions[0]["expr"], type)
+        # key columns can also be labelled expressions (e.g. a search rank). Those are selected alongside the entity
+        # so their values can go into the cursor, and compared by their underlying expression
+        extra = [column for column in key if isinstance(column, Label)]
+        if extra:
+            query = query.add_columns(*extra)
+        compared = [column.element if isinstance(column, Label) else column for column in key]
+        key_expr = tuple_(*compared) if len(key) > 1 else compared[0]
+        # walking backwards ("before") flips both the comparison and the ordering, the rows get reversed afterwards
+        backwards = before is not None
+        ascending = descending == backwards
+
+        cursor = before if backwards else after
+        if cursor is not None:
+            values = decode_cursor(cursor, key)
+            bound = tuple_(*values) if len(key) > 1 else values[0]
+            query = query.filter(key_expr > bound if ascending else key_expr < bound)
+
+        query = query.order_by(*(column.asc() if ascending else column.desc() for column in key))
+        rows = query.limit(limit + 1).all() # one extra row tells us whether there is another page
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+
+        def key_of(row) -> str:
+            if extra and entity_rows:
+                entity, values = row[0], row._mapping
+                return encode_cursor(tuple(values[column.key] if isinstance(column, Label) else getattr(entity, column.key) for column in key))
+            return encode_cursor(tuple(getattr(row, column.key) for column in key))
+
+        page = Page(items=[row[0] for row in rows] if extra and entity_rows else rows)
+        if rows:
+            has_next = has_more if not backwards else True
+            has_prev = has_more if backwards else cursor is not None
+            page.next_cursor = key_of(rows[-1]) if has_next else None
+            page.prev_cursor = key_of(rows[0]) if has_prev else None
+        return page
+
+
+@dataclass
+class StreamedPage(Generic[T]):
+    items: AsyncIterator[T] | None = None # iterate once, the rows are fetched as they are consumed
+    next_cursor: str | None = None # known once items has been iterated
+    prev_cursor: str | None = None
+
+
+# Like paginate, for pages too big to hold in memory (e.g. streamed into an HTML response). The rows are fetched in
+# batches of STREAM_BATCH_SIZE from a server-side cursor while the caller iterates page.items, and options (loaders,
+# column expressions) are applied to those rows only. A "before" page first walks back over the key columns alone to
+# find where it starts, then is streamed forwards like any other page. Cursor errors are raised here, before any rows
+async def stream(
+        db: AsyncSession,
+        statement: Select,
+        key: tuple[InstrumentedAttribute | Label, ...],
+        descending: bool = False,
+        limit: int = 10,
+        after: str | None = None,
+        before: str | None = None,
+        options: tuple = ()
+    ) -> StreamedPage:
+        extra = [column for column in key if isinstance(column, Label)]
+        compared = [column.element if isinstance(column, Label) else column for column in key]
+        key_expr = tuple_(*compared) if len(key) > 1 else compared[0]
+
+        def bound(values: tuple):
+            return tuple_(*values) if len(key) > 1 else values[0]
+
+        def ordered(statement: Select, reverse: bool = False) -> Select:
+            ascending = descending == reverse
+            return statement.order_by(*(column.asc() if ascending else column.desc() for column in compared))
+
+        page = StreamedPage()
+        has_next = has_prev = False
+        fetch = limit + 1 # one extra row tells us whether there is another page
+        if before is not None:
+            end = bound(decode_cursor(before, key))
+            statement = statement.where(key_expr > end if descending else key_expr < end)
+            keys = (await db.execute(ordered(statement.with_only_columns(*compared), reverse=True).limit(limit + 1))).all()
+            if not keys:
+                page.items = _no_rows()
+                return page
+            has_next, has_prev = True, len(keys) > limit
+            start = bound(tuple(keys[min(limit, len(keys)) - 1]))
+            statement = statement.where(key_expr <= start if descending else key_expr >= start)
+            fetch = limit
+        elif after is not None:
+            start = bound(decode_cursor(after, key))
+            statement = statement.where(key_expr < start if descending else key_expr > start)
+            has_prev = True
+
+        statement = ordered(statement.add_columns(*extra).options(*options)).limit(fetch)
+        statement = statement.execution_options(yield_per=config.STREAM_BATCH_SIZE)
+
+        def key_of(row) -> str:
+            if extra:
+                entity, values = row[0], row._mapping
+                return encode_cursor(tuple(values[column.key] if isinstance(column, Label) else getattr(entity, column.key) for column in key))
+            return encode_cursor(tuple(getattr(row, column.key) for column in key))
+
+        async def items():
+            result = await db.stream(statement)
+            rows = result if extra else result.scalars()
+            count, last = 0, None
+            async for row in rows:
+                if count == limit:
+                    page.next_cursor = key_of(last) # the extra row, there is a next page
+                    break
+                if count == 0 and has_prev:
+                    page.prev_cursor = key_of(row)
+                count, last = count + 1, row
+                yield row[0] if extra else row
+            else:
+                if has_next and last is not None:
+                    page.next_cursor = key_of(last)
+            await result.close()
+
+        page.items = items()
+        return page
+
+async def _no_rows():
+    return
+    yield
+
+
+# list endpoints keep returning a plain JSON array, the cursors for the neighbouring pages go in the response headers
+def set_page_headers(request: Request, response: Response, page: Page):
+    links = []
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        next_url = request.url.remove_query_params("before").include_query_params(after=page.next_cursor)
+        links.append(f'<{next_url}>; rel="next"')
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
+        prev_url = request.url.remove_query_params("after").include_query_params(before=page.prev_cursor)
+        links.append(f'<{prev_url}>; rel="prev"')
+    if links:
+        response.headers["Link"] = ", ".join(links)
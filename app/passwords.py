@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from app import config
+
+# Password hashing and verification.
+# bcrypt is deliberately slow (around 250ms at the default cost), so every hash and verify runs on a small dedicated
+# thread pool instead of the event loop or the request threadpool, and at most PASSWORD_HASH_QUEUE_LIMIT of them can be
+# waiting for it. Past that, PasswordHasherBusy is raised and the routes answer 503 rather than letting a burst of
+# logins queue up without bound.
+# Hashes made with a different cost than PASSWORD_HASH_ROUNDS are reported for rehashing when they verify, so changing
+# the cost migrates users as they sign in. Accounts without a password (created through Google sign in) never verify.
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+rounds = config.PASSWORD_HASH_ROUNDS
+# min and max pinned to the cost, so hashes made with any other cost need an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds,
+)
+
+_executor = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="passwords")
+# running plus waiting calls
+_slots = threading.BoundedSemaphore(config.PASSWORD_HASH_WORKERS + config.PASSWORD_HASH_QUEUE_LIMIT)
+
+
+def _submit(fn, *args) -> Future:
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy("Too many password checks in progress, try again shortly")
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+# (whether password matches, the new hash to store when the stored one uses an outdated cost)
+def _verify(password: str, hashed: str | None) -> tuple[bool, str | None]:
+    if not hashed:
+        return False, None
+    return pwd_context.verify_and_update(password, hashed)
+
+
+# for sync code (threadpool routes, crud). Blocks the calling thread until the pool is done
+def hash_password(password: str) -> str:
+    return _submit(pwd_context.hash, password).result()
+
+def verify_password(password: str, hashed: str | None) -> tuple[bool, str | None]:
+    return _submit(_verify, password, hashed).result()
+
+
+# for async routes, the event loop keeps serving other requests meanwhile
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(pwd_context.hash, password))
+
+async def verify_password_async(password: str, hashed: str | None) -> tuple[bool, str | None]:
+    return await asyncio.wrap_future(_submit(_verify, password, hashed))
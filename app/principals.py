@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy.orm import Session
+
+from app import config
+from app.database import after_commit
+from app.models import User
+
+# The authenticated principal behind a request: the user fields the routes authorize and filter by.
+# Resolving a token's username to its user would otherwise be a users query on every request (every page, every
+# dashboard poll), so principals are kept in a bounded LRU cache with a TTL. crud.update_user, update_user_password and
+# delete_user drop the user's entry once their transaction commits. Being in-process, each worker only sees its own
+# writes, other workers pick the change up when the entry expires.
+# Tokens also carry the user id and role as claims. With AUTH_TRUST_TOKEN_CLAIMS on they are used as is and no lookup
+# happens at all, at the price of role changes and deletions only taking effect once the token expires.
+
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: int
+    username: str
+    role: str
+
+    @classmethod
+    def of(cls, user: User) -> "Principal":
+        return cls(user_id=user.user_id, username=user.username, role=user.role)
+
+
+# the claims put in the access tokens issued for user
+def token_claims(user: User) -> dict:
+    return {"sub": user.username, "uid": user.user_id, "role": user.role}
+
+def from_claims(payload: dict) -> Principal | None:
+    if not config.AUTH_TRUST_TOKEN_CLAIMS or payload.get("uid") is None or payload.get("role") is None:
+        return None
+    return Principal(user_id=payload["uid"], username=payload["sub"], role=payload["role"])
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[Principal, float]] = OrderedDict() # username -> (principal, expiry)
+        self._lock = threading.Lock()
+        # bumped by every invalidation, so a lookup that read the user before a change can't cache what it read
+        self.generation = 0
+
+    def get(self, username: str) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return entry[0]
+
+    # generation is the value read before loading the user
+    def put(self, principal: Principal, generation: int) -> Principal:
+        if self.max_size <= 0:
+            return principal
+        with self._lock:
+            if generation == self.generation:
+                self._entries[principal.username] = (principal, time.monotonic() + self.ttl)
+                self._entries.move_to_end(principal.username)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, *usernames: str):
+        with self._lock:
+            self.generation += 1
+            for username in usernames:
+                self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+cache = PrincipalCache(config.PRINCIPAL_CACHE_SIZE, config.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+# called by crud when a user changes or is deleted, the entries are dropped once the transaction commits
+def user_changed(db: Session, *usernames: str):
+    after_commit(db, lambda: cache.invalidate(*usernames))
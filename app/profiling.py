@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import ExecuteStyle
+
+from app import config
+
+# Per-request SQL profiling.
+# Cursor execute events on every engine are attributed to the request being served (tracked in a context variable,
+# which follows the request into threadpool routes and AsyncSession.run_sync), counting the statements and the time
+# spent in them. A statement that runs several times with the same SQL text within one request is flagged as a likely
+# N+1 (e.g. a relationship lazy loaded per row). Each response reports its numbers in the Server-Timing header, and the
+# totals per route are kept for the opt-in /debug/slow-routes endpoint.
+
+logger = logging.getLogger(__name__)
+
+_TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+@dataclass
+class RequestProfile:
+    query_count: int = 0
+    query_time: float = 0.0 # seconds
+    statements: dict[str, int] = field(default_factory=dict) # SQL text -> times executed
+
+    # statements executed often enough in this request to look like an N+1. Transaction control is expected to repeat
+    def repeated(self) -> dict[str, int]:
+        threshold = config.SQL_PROFILING_REPEAT_THRESHOLD
+        return {
+            statement: count for statement, count in self.statements.items()
+            if count >= threshold and not statement.lstrip().upper().startswith(_TRANSACTION_CONTROL)
+        }
+
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    total_queries: int = 0
+    max_queries: int = 0
+    total_query_time: float = 0.0
+    repeated: dict[str, int] = field(default_factory=dict) # SQL text -> most times it ran in a single request
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar("sql_profile", default=None)
+_routes: dict[str, RouteStats] = {}
+_routes_lock = threading.Lock()
+
+
+# Engine events. The start time is kept on the connection, statements on one connection never overlap
+
+def _before_cursor_execute(conn, _cursor, _statement, _parameters, _context, _executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, _cursor, statement, _parameters, context, _executemany):
+    profile = _current.get()
+    if profile is None or not conn.info.get("profiling_started"):
+        return
+    profile.query_time += time.perf_counter() - conn.info["profiling_started"].pop()
+    profile.query_count += 1
+    # a bulk insert sent as several multi-row batches (insertmanyvalues) repeats its statement by design
+    if context is None or context.execute_style is not ExecuteStyle.INSERTMANYVALUES:
+        profile.statements[statement] = profile.statements.get(statement, 0) + 1
+
+def instrument(engine: Engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _record(route: str, elapsed: float, profile: RequestProfile, repeated: dict[str, int]):
+    with _routes_lock:
+        stats = _routes.setdefault(route, RouteStats())
+        stats.requests += 1
+        stats.total_time += elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+        stats.total_queries += profile.query_count
+        stats.max_queries = max(stats.max_queries, profile.query_count)
+        stats.total_query_time += profile.query_time
+        for statement, count in repeated.items():
+            stats.repeated[statement] = max(count, stats.repeated.get(statement, 0))
+
+def _server_timing(elapsed: float, profile: RequestProfile, repeated: dict[str, int]) -> str:
+    metrics = [
+        f'db;dur={profile.query_time * 1000:.2f};desc="{profile.query_count} queries"',
+        f"app;dur={elapsed * 1000:.2f}",
+    ]
+    if repeated:
+        metrics.append(f'db-repeated;desc="{len(repeated)} statements repeated up to {max(repeated.values())} times"')
+    return ", ".join(metrics)
+
+
+# http middleware, registered in main.py
+async def profile_request(request: Request, call_next):
+    profile = RequestProfile()
+    token = _current.set(profile)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+    elapsed = time.perf_counter() - started
+
+    # the route template rather than the URL, so /items/1 and /items/2 are counted together
+    route = request.scope.get("route")
+    route_name = f"{request.method} {route.path if route is not None else request.url.path}"
+    repeated = profile.repeated()
+    if repeated:
+        logger.warning("%s repeated statements (possible N+1): %s", route_name, repeated)
+    _record(route_name, elapsed, profile, repeated)
+    response.headers["Server-Timing"] = _server_timing(elapsed, profile, repeated)
+    return response
+
+
+# the routes seen so far, slowest (by mean duration) first
+def slowest_routes(limit: int = 20) -> list[dict]:
+    with _routes_lock:
+        ranked = sorted(_routes.items(), key=lambda entry: entry[1].total_time / entry[1].requests, reverse=True)
+        return [
+            {
+                "route": route,
+                "requests": stats.requests,
+                "avg_ms": round(stats.total_time / stats.requests * 1000, 2),
+                "max_ms": round(stats.max_time * 1000, 2),
+                "avg_queries": round(stats.total_queries / stats.requests, 2),
+                "max_queries": stats.max_queries,
+                "avg_query_ms": round(stats.total_query_time / stats.requests * 1000, 2),
+                "repeated_statements": [{"statement": statement, "max_count": count} for statement, count in stats.repeated.items()],
+            }
+            for route, stats in ranked[:limit]
+        ]
+
+def reset():
+    with _routes_lock:
+        _routes.clear()
@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+
+# JSON responses for routes that build their content as plain dicts (see crud.get_item_rows) and return it directly,
+# skipping FastAPI's response model handling and jsonable_encoder. ORJSONResponse encodes the content as it is, with
+# Decimals as strings and datetimes in ISO format like Pydantic does. model_response validates it through a model first
+# and lets pydantic-core serialize it, used where the model depends on the request (sparse fieldsets).
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+# FastAPI only copies the headers set on the injected response (ETag, Link, ...) onto responses it builds itself
+def _with_headers(encoded: Response, response: Response | None) -> Response:
+    if response is not None:
+        encoded.headers.raw.extend(response.headers.raw)
+    return encoded
+
+# content as an ORJSONResponse carrying the headers the route set on its injected response
+def json_response(content, response: Response | None = None, status_code: int = 200) -> ORJSONResponse:
+    return _with_headers(ORJSONResponse(content, status_code=status_code), response)
+
+# content validated and serialized by adapter (see fieldsets.adapter), for the sparse fieldset reads
+def model_response(adapter: TypeAdapter, content, response: Response | None = None) -> Response:
+    return _with_headers(Response(adapter.dump_json(adapter.validate_python(content)), media_type="application/json"), response)
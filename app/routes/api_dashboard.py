@@ -1,35 +1,74 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import InventoryItem, User
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import config, dashboard, events
+from app.database import get_async_read_db
+from app.pagination import PaginationError, set_page_headers
+from app.principals import Principal
 from app.routes.ui import get_current_user_from_cookie
 
 router = APIRouter(prefix="/api/dashboard")
 
 @router.get("/summary")
 async def dashboard_summary(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_cookie)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user_from_cookie)
 ):
-    items = db.query(InventoryItem).filter(InventoryItem.created_by == current_user.user_id).all()
-    total_value = sum(item.quantity * float(item.price) for item in items)
-    total_items = len(items)
+    figures = await db.run_sync(dashboard.summary, current_user.user_id)
 
     return {
-        "total_inventory_value" : total_value,
-        "total_items" : total_items
+        "total_inventory_value" : figures["total_inventory_value"],
+        "total_items" : figures["total_items"],
+        "low_stock_count" : figures["low_stock_count"]
     }
+# every low stock item, lowest stock first. With limit (or a cursor) it's paged instead, the cursors for the neighbouring
+# pages are in the Link and X-Next-Cursor/X-Prev-Cursor headers like on the other list endpoints
 @router.get("/low-stock")
 async def low_stock_items(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_cookie)
+    request: Request,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=1000),
+    after: str | None = None,
+    before: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user_from_cookie)
 ):
-    items = db.query(InventoryItem).filter(
-        InventoryItem.created_by == current_user.user_id,
-        InventoryItem.quantity < 10
-    ).all()
+    if limit is None and after is None and before is None:
+        items = await db.run_sync(dashboard.low_stock_items, current_user.user_id)
+    else:
+        try:
+            page = await db.run_sync(dashboard.low_stock_page, current_user.user_id, limit or config.DASHBOARD_LIST_LIMIT, after, before)
+        except PaginationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        set_page_headers(request, response, page)
+        items = page.items
 
     return [
         {"name" : item.name, "quantity" : item.quantity}
         for item in items
-    ]
\ No newline at end of file
+    ]
+
+# server-sent events with the user's summary changes ("summary") and items entering or leaving low stock ("low_stock"),
+# pushed when items are written (see app/events.py) instead of the page polling the endpoints above
+@router.get("/stream")
+async def dashboard_stream(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user_from_cookie)
+):
+    user_id = current_user.user_id
+    # the session (shared with get_current_user_from_cookie) isn't needed anymore, don't hold its connection for the whole stream
+    await db.close()
+
+    async def stream():
+        async with events.subscribe(user_id) as queue:
+            yield f"retry: {config.SSE_KEEPALIVE_SECONDS * 1000}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=config.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield events.format_sse(event)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -9,9 +9,9 @@ import os
 from dotenv import load_dotenv
 
 
-from app import crud, schemas
+from app import crud, passwords, principals, schemas
 from app.database import get_db
-from app.models import User
+from app.principals import Principal
 
 
 load_dotenv()
@@ -56,8 +56,8 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# extract and return the current user based on the JWT token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+# extract and return the current user based on the JWT token. The user is only looked up when it isn't cached (see app/principals.py)
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -70,14 +70,18 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except InvalidTokenError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+
+    principal = principals.from_claims(payload) or principals.cache.get(username)
+    if principal is None:
+        generation = principals.cache.generation
+        user = crud.get_user_by_username(db, username)
+        if user is None:
+            raise credentials_exception
+        principal = principals.cache.put(Principal.of(user), generation)
+    return principal
 
 # ensures user has admin role
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     if current_user.role.lower() != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -88,7 +92,7 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
 # register a new user
 @router.post("/register", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
 def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = crud.get_user_by_username(db, user.username)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered.")
     return crud.create_user(db, user)
@@ -96,24 +100,30 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 # login a user
 @router.post("/login")
 def login(form_date: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_date.username).first()
-    if not user or not crud.pwd_context.verify(form_date.password, user.password):
+    user = crud.get_user_by_username(db, form_date.username)
+    verified, new_hash = passwords.verify_password(form_date.password, user.password) if user else (False, None)
+    if not verified:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
+    if new_hash:
+        crud.set_password_hash(db, user, new_hash) # hashed with an outdated cost, upgrade it now that we know the password
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub" : user.username},
+        data=principals.token_claims(user),
         expires_delta=access_token_expires,
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/profile", response_model=schemas.User)
-def read_profile(current_user: schemas.User = Depends(get_current_user)):
-    return current_user
+def read_profile(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    user = crud.get_user(db, current_user.user_id) # the full record, the principal only holds what authorization needs
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return user
 
 @router.get("/admin", response_model=schemas.User)
-def admin_endpoint(current_user: User = Depends(require_admin)):
+def admin_endpoint(current_user: Principal = Depends(require_admin)):
     return {"message" : f"Welcome, admin {current_user.username}"}
 
 
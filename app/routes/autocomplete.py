@@ -0,0 +1,27 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import autocomplete, config
+from app.database import get_async_read_db
+from app.principals import Principal
+from app.routes.ui import get_current_user_from_cookie
+
+
+router = APIRouter(prefix="/autocomplete")
+
+
+# suggestions from the current user's own items. Declared before /{kind} so "items" isn't matched as a kind
+@router.get("/items")
+async def autocomplete_items(
+    q: str = "",
+    limit: int = Query(config.AUTOCOMPLETE_LIMIT, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user_from_cookie)
+):
+    index = await db.run_sync(autocomplete.user_items, current_user.user_id) # only hits the database the first time for this user
+    return index.search(q.strip(), limit)
+
+@router.get("/{kind}")
+async def autocomplete_names(kind: Literal["categories", "suppliers"], q: str = "", limit: int = Query(config.AUTOCOMPLETE_LIMIT, ge=1, le=50)):
+    index = autocomplete.categories if kind == "categories" else autocomplete.suppliers
+    return index.search(q.strip(), limit)
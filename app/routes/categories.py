@@ -1,19 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
-from app import crud, schemas
-from app.database import get_db
+from app import config, crud, etags, responses, schemas
+from app.models import Category
+from app.database import get_db, get_read_db
+from app.fieldsets import FieldsetError, adapter, sparse_model
+from app.pagination import PaginationError, set_page_headers
 
 
 router = APIRouter()
 
 
-@router.get("/", response_model=list[schemas.Category])
-def list_categories(skip: int = 0, limit: int = 10, search: str | None = None, db: Session = Depends(get_db)):
-    return crud.get_categories(db, skip=skip, limit=limit, search=search)
+@router.get("/", response_model=list[sparse_model(schemas.Category)])
+def list_categories(
+    request: Request,
+    response: Response,
+    limit: int = 10,
+    search: str | None = None,
+    sort: str = "category_id",
+    after: str | None = None,
+    before: str | None = None,
+    fields: str | None = None,
+    db: Session = Depends(get_read_db)
+):
+    # a matching If-None-Match gets a 304 without running the query (see app/etags.py)
+    not_modified = etags.check(request, response, db, (Category,), etags.cache_control(config.CATALOG_CACHE_MAX_AGE))
+    if not_modified:
+        return not_modified
+    try:
+        fieldset = crud.category_fieldset(fields)
+        page = crud.get_category_rows(db, limit=limit, search=search, sort=sort, after=after, before=before, fieldset=fieldset)
+    except (PaginationError, FieldsetError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_page_headers(request, response, page)
+    return responses.model_response(adapter(schemas.Category, fieldset, many=True), page.items, response)
 
 
 @router.get("/{category_id}", response_model=schemas.Category)
-def read_category(category_id: int, db: Session = Depends(get_db)):
+def read_category(category_id: int, db: Session = Depends(get_read_db)):
     db_category = crud.get_category(db, category_id)
     if not db_category:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, details="Category not found")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Query, status
+from app import profiling
+
+
+# only included when SQL_PROFILING_DEBUG is on (see main.py)
+router = APIRouter(prefix="/debug")
+
+
+# routes seen by this worker, slowest first, with their statement counts and any repeated (N+1 looking) statements
+@router.get("/slow-routes")
+def slow_routes(limit: int = Query(20, ge=1, le=200)):
+    return profiling.slowest_routes(limit)
+
+# start collecting from scratch, e.g. before re-running a scenario
+@router.delete("/slow-routes", status_code=status.HTTP_204_NO_CONTENT)
+def reset_slow_routes():
+    profiling.reset()
@@ -1,28 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from decimal import Decimal
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app import crud, schemas
-from app.database import get_db
+from starlette.background import BackgroundTask
+from app import config, crud, etags, schemas, item_batch, item_import, item_export, responses
+from app.database import ReadSessionLocal, get_db, get_read_db
+from app.fieldsets import FieldsetError, adapter, sparse_model
+from app.pagination import PaginationError, set_page_headers
 
 
 router = APIRouter()
 
-# get all items
-@router.get("/", response_model=list[schemas.InventoryItem])
-def list_items(skip: int = 0, limit: int = 10, search: str | None = None, category_id: int | None = None, db: Session = Depends(get_db)):
-    return crud.get_items(db, skip=skip, limit=limit, search=search, category_id=category_id )
+# get a page of items. The cursors for the next/previous page are returned in the Link and X-Next-Cursor/X-Prev-Cursor headers.
+# GETs carry an ETag, a matching If-None-Match gets a 304 without running the query (see app/etags.py).
+# The reads build plain dicts, validated and serialized through a model of the requested fields (see app/responses.py).
+# fields= and expand= narrow them down to some of the fields and relations, and the query to those columns (see app/fieldsets.py)
+@router.get("/", response_model=list[sparse_model(schemas.InventoryItem)])
+def list_items(
+    request: Request,
+    response: Response,
+    limit: int = 10,
+    search: str | None = None,
+    category_id: int | None = None,
+    sort: str | None = None,
+    after: str | None = None,
+    before: str | None = None,
+    fields: str | None = None,
+    expand: str | None = None,
+    db: Session = Depends(get_read_db)
+):
+    not_modified = etags.check(request, response, db, etags.ITEM_TABLES, etags.cache_control(config.ITEMS_CACHE_MAX_AGE))
+    if not_modified:
+        return not_modified
+    try:
+        fieldset = crud.item_fieldset(fields, expand)
+        page = crud.get_item_rows(db, limit=limit, search=search, category_id=category_id, sort=sort, after=after, before=before, fieldset=fieldset)
+    except (PaginationError, FieldsetError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_page_headers(request, response, page)
+    return responses.model_response(adapter(schemas.InventoryItem, fieldset, many=True), page.items, response)
+
+# download the items matching the list filters as CSV, NDJSON or Parquet, written while the rows are read (see app/item_export.py).
+# The session outlives the request's dependencies, so the route opens its own and closes it once the download ends.
+# Declared before /{item_id} so "export" isn't taken as an id
+@router.get("/export")
+def export_items(
+    format: str = "csv",
+    search: str | None = None,
+    category_id: int | None = None,
+    created_by: int | None = None,
+    sort: str | None = None,
+    currency: str | None = None,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None
+):
+    if format not in item_export.SUPPORTED_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported format, expected one of: {', '.join(item_export.SUPPORTED_FORMATS)}")
+    try:
+        item_export.check_format(format)
+    except item_export.ExportUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    db = ReadSessionLocal()
+    # the converted prices come from the stored rates, a currency without one would give an empty file
+    if currency and currency != config.EXCHANGE_RATE_BASE and crud.get_exchange_rate(db, config.EXCHANGE_RATE_BASE, currency) is None:
+        db.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"No exchange rate from {config.EXCHANGE_RATE_BASE} to {currency}")
+    try:
+        statement, names = item_export.export_statement(
+            db, search=search, category_id=category_id, created_by=created_by, sort=sort,
+            currency=currency, min_price=min_price, max_price=max_price
+        )
+    except PaginationError as e:
+        db.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamingResponse(
+        item_export.export_items(db, statement, names, format),
+        media_type=item_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="items.{format}"'},
+        background=BackgroundTask(db.close),
+    )
 
 # get a single item
-@router.get("/{item_id}", response_model=schemas.InventoryItem)
-def read_item(item_id: int, db: Session = Depends(get_db)):
-    db_item = crud.get_item(db, item_id)
-    if not db_item:
+@router.get("/{item_id}", response_model=sparse_model(schemas.InventoryItem))
+def read_item(
+    item_id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    expand: str | None = None,
+    db: Session = Depends(get_read_db)
+):
+    not_modified = etags.check(request, response, db, etags.ITEM_TABLES, etags.cache_control(config.ITEMS_CACHE_MAX_AGE))
+    if not_modified:
+        return not_modified
+    try:
+        fieldset = crud.item_fieldset(fields, expand)
+    except FieldsetError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    item = crud.get_item_row(db, item_id, fieldset)
+    if not item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail = "Item not found")
-    return db_item
+    return responses.model_response(adapter(schemas.InventoryItem, fieldset), item, response)
 
 # create an item
 @router.post("/", response_model=schemas.InventoryItem, status_code=status.HTTP_201_CREATED)
 def create_item(item: schemas.InventoryItemCreate, db: Session = Depends(get_db)):
-    return crud.create_item(db, item)
+    db_item = crud.create_item(db, item)
+    # read it back with its relationships loaded for the response
+    return crud.get_item(db, db_item.item_id, options=crud.LOAD_FULL)
+
+# bulk import items from an uploaded CSV or NDJSON file. Declared before /{item_id} so "import" isn't taken as an id
+@router.post("/import", response_model=schemas.ItemImportReport)
+def import_items(file: UploadFile = File(...), format: str | None = None, created_by: int | None = None, db: Session = Depends(get_db)):
+    fmt = format
+    if not fmt:
+        # work out the format from the file name or content type when it isn't given explicitly
+        filename = (file.filename or "").lower()
+        is_ndjson = filename.endswith((".ndjson", ".jsonl")) or (file.content_type or "") in ("application/x-ndjson", "application/jsonl")
+        fmt = "ndjson" if is_ndjson else "csv"
+    if fmt not in item_import.SUPPORTED_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported format, expected one of: {', '.join(item_import.SUPPORTED_FORMATS)}")
+    return item_import.import_items(db, file.file, fmt, default_created_by=created_by)
+
+# run a list of get/create/update/delete operations in one request and one transaction (see app/item_batch.py).
+# Answers 200 once the batch has committed. An atomic batch that failed answers with the failing operation's status
+# and nothing applied. Declared before /{item_id} so "batch" isn't taken as an id
+@router.post("/batch", response_model=schemas.ItemBatchReport)
+def batch_items(batch: schemas.ItemBatch, db: Session = Depends(get_db)):
+    if len(batch.operations) > config.BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"A batch can have at most {config.BATCH_MAX_OPERATIONS} operations")
+    report, status_code = item_batch.run_batch(db, batch)
+    return responses.json_response(report, status_code=status_code)
 
 # update an item
 @router.post("/{item_id}", response_model=schemas.InventoryItem)
@@ -30,15 +138,17 @@ def update_item(item_id: int, updates: schemas.InventoryItemUpdate, db: Session
     db_item = crud.get_item(db, item_id)
     if not db_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail = "Item not found")
-    return crud.update_item(db, db_item, updates)
+    db_item = crud.update_item(db, db_item, updates)
+    return crud.get_item(db, db_item.item_id, options=crud.LOAD_FULL)
 
 # delete an item
 @router.delete("/{item_id}", response_model=schemas.InventoryItem)
 def delete_item(item_id: int, db: Session = Depends(get_db)):
-    db_item = crud.get_item(db, item_id)
+    db_item = crud.get_item(db, item_id, options=crud.LOAD_FULL)
     if not db_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
-    deleted_item = crud.delete_item(db,item_id)
-    if not deleted_item:
+    # serialize before deleting, the row can't be refreshed once it's gone
+    deleted_item = schemas.InventoryItem.model_validate(db_item, from_attributes=True)
+    if not crud.delete_item(db,item_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unable to delete item")
     return deleted_item
\ No newline at end of file
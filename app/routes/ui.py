@@ -1,17 +1,21 @@
 from datetime import timedelta
-from fastapi import APIRouter, Request, Form, Depends, HTTPException, status
+from decimal import Decimal, InvalidOperation
+from fastapi import APIRouter, Request, Form, Depends, HTTPException, Query, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import jwt
 
-from app import models, schemas, crud
-from app.database import get_db
+from app import models, schemas, crud, async_crud, autocomplete, config, passwords, principals, dashboard as dashboard_panels
+from app.database import AsyncReadSessionLocal, get_async_db, get_async_read_db
 from app import crud, schemas
 from app.models import User, Category, InventoryItem, Supplier
+from app.principals import Principal
 from app.routes.auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
-from app.currency_utils import get_exchange_rate
 from app.crud import get_item_by_user 
+from app.pagination import PaginationError
+from app.templating import templates
+from app import templating
 
 import os
 
@@ -22,7 +26,6 @@ if not SECRET_KEY:
     raise RuntimeError("Missing SECRET_KEY in environment")
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -38,17 +41,20 @@ async def login_user(
     request: Request,
     username: str = Form(..., max_length=50), # extracts username from submitted form
     password: str = Form(..., max_length=100), # extracts password from submitted form
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):  
     # check user credentials from db
-    user = db.query(User).filter(User.username == username).first()
+    user = await async_crud.get_user_by_username(db, username)
     # if username or password not correct, load login.html page with error message
-    if not user or not crud.pwd_context.verify(password, user.password):
+    verified, new_hash = await passwords.verify_password_async(password, user.password) if user else (False, None)
+    if not verified:
         return templates.TemplateResponse("login.html", {"request" : request, "error" : "Invalid Credentials"})
+    if new_hash:
+        await async_crud.set_password_hash(db, user, new_hash) # hashed with an outdated cost, upgrade it now that we know the password
     
     # create a JWT token 
     token = create_access_token(
-        data={'sub': user.username},
+        data=principals.token_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -69,17 +75,17 @@ async def register_user(
     username: str = Form(..., max_length=50),
     password: str = Form(..., max_length=100),
     role:  str = Form(..., max_length=20),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # we first check if the user exists
-    exisiting_user = db.query(User).filter(User.username == username).first()
+    exisiting_user = await async_crud.get_user_by_username(db, username)
     if exisiting_user:
         return templates.TemplateResponse("register.html", {"request" : request, "error" : "User already registered"})
     
     # now we can create the user 
     user_in = schemas.UserCreate(username=username, password=password, role=role)
     try:
-        crud.create_user(db, user_in)
+        await async_crud.create_user(db, user_in)
     except Exception as e:
         return templates.TemplateResponse("register.html", {"request" : request, "error" : f"Registration failed: {str(e)}"})
     
@@ -88,7 +94,8 @@ async def register_user(
     return response
 
 #cookie based dependancy. Retrieves token from the requests cookies (instead of expecting authorization header)
-def get_current_user_from_cookie(request: Request, db: Session = Depends(get_db)) -> User:
+# the user is only looked up when it isn't cached (see app/principals.py)
+async def get_current_user_from_cookie(request: Request, db: AsyncSession = Depends(get_async_read_db)) -> Principal:
     token = request.cookies.get("access_token")
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
@@ -99,16 +106,23 @@ def get_current_user_from_cookie(request: Request, db: Session = Depends(get_db)
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    principal = principals.from_claims(payload) or principals.cache.get(username)
+    if principal is None:
+        generation = principals.cache.generation
+        user = await async_crud.get_user_by_username(db, username)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        principal = principals.cache.put(Principal.of(user), generation)
+    return principal
 
 
 # route to user profile page
 @router.get("/profile", response_class=HTMLResponse)
-async def profile_page(request: Request, current_user: schemas.User = Depends(get_current_user_from_cookie)):
-    return templates.TemplateResponse("profile.html", {"request" : request, "current_user" : current_user})
+async def profile_page(request: Request, current_user: Principal = Depends(get_current_user_from_cookie), db: AsyncSession = Depends(get_async_read_db)):
+    user = await async_crud.get_user(db, current_user.user_id) # the full record, the principal only holds what authorization needs
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return templates.TemplateResponse("profile.html", {"request" : request, "current_user" : user})
 
 # logout route to redirect user to login page after they logout
 @router.get("/logout")
@@ -118,36 +132,43 @@ async def logout(_request: Request):
     return response
 
 
+# page sizes offered by the inventory pages
+PAGE_SIZES = [size for size in (10, 25, 50, 100, 500, 1000, 5000) if size <= config.UI_MAX_PAGE_SIZE]
+
+# The inventory pages are streamed: the HTML is sent while the rows are still being fetched, so any page size renders
+# in constant memory (see app/templating.py). Their rows come from a session that outlives the route, closed by the response
+
 @router.get("/inventory/manage", response_class=HTMLResponse)
 async def manage_inventory(
     request: Request,
     search: str | None = None,
-    page: int = 1,
+    after: str | None = None,
+    before: str | None = None,
     category_id: str | None = None, 
-    current_user: User = Depends(get_current_user_from_cookie), 
-    db: Session = Depends(get_db)
+    limit: int = Query(10, ge=1, le=config.UI_MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user_from_cookie)
     ):
-        limit = 10
-        skip = (page - 1) * limit
         cat_id = int(category_id) if category_id and category_id.strip() else None 
 
-        items = crud.get_items(db, skip=skip, limit=limit, created_by=current_user.user_id)
-
-        prev_page = page - 1 if page > 1 else None
-        next_page = page + 1 if len(items) == limit else None
-
-        categories = crud.get_categories(db)
-        categories_data = [{"category_id": cat.category_id, "name": cat.name} for cat in categories]
-        return templates.TemplateResponse("manage_inventory.html", {
-            "request": request, 
+        db = AsyncReadSessionLocal()
+        try:
+            page = await async_crud.stream_items(db, limit=limit, created_by=current_user.user_id, after=after, before=before)
+        except PaginationError as e:
+            await db.close()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except BaseException:
+            await db.close()
+            raise
+
+        # the category picker fetches its suggestions from /autocomplete/categories as the user types
+        return templating.stream(request, "manage_inventory.html", {
             "current_user": current_user, 
             "limit" : limit,
-            "prev_page" : prev_page,
-            "next_page" : next_page,
+            "page_sizes" : PAGE_SIZES,
+            "page" : page,
             "search": search,
-            "items": items,
-            "categories": categories_data
-        })
+            "items": page.items
+        }, on_close=db.close)
 
 
 @router.get("/inventory/view", response_class=HTMLResponse)
@@ -156,43 +177,64 @@ async def view_inventory(
     search: str | None = None, 
     category_id: str | None = None,
     currency: str = "CAD", 
-    page: int = 1, 
-    current_user: User = Depends(get_current_user_from_cookie), 
-    db: Session = Depends(get_db)
+    sort: str | None = None,
+    min_price: str | None = None,
+    max_price: str | None = None,
+    after: str | None = None,
+    before: str | None = None,
+    limit: int = Query(10, ge=1, le=config.UI_MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user_from_cookie)
 ):
-    limit = 10
-    skip = (page - 1) * limit
     search = search.strip() if search else None
     cat_id = int(category_id) if category_id and category_id.strip() else None # convert category_id to int if provided and is non-empty; otherwise we can set to None
+    sort = sort or None
+    try:
+        # the price range is in the selected currency, empty inputs mean no bound
+        low = Decimal(min_price) if min_price and min_price.strip() else None
+        high = Decimal(max_price) if max_price and max_price.strip() else None
+    except InvalidOperation:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid price range")
 
-    items = crud.get_items(db, skip=skip, limit=limit, search=search, created_by=current_user.user_id)
-
-    exchange_rate = 1.0
-    if currency != "CAD":
-        exchange_rate = await get_exchange_rate("CAD", currency) # get exchange rate
-    
-    # apply the exchange rate to item prices dynamically
-    for item in items:
-        item.price = float(item.price) * exchange_rate
-
-    prev_page = page - 1 if page > 1 else None
-    next_page = page + 1 if len(items) == limit else None
-
-    categories = crud.get_categories(db)
-
-    return templates.TemplateResponse("view_inventory.html", {
-        "request" : request,
+    db = AsyncReadSessionLocal()
+    try:
+        exchange_rate = 1.0
+        if currency != config.EXCHANGE_RATE_BASE:
+            rate = await async_crud.get_exchange_rate(db, config.EXCHANGE_RATE_BASE, currency) # kept current in the background, see currency_utils.py
+            if rate is None:
+                currency = config.EXCHANGE_RATE_BASE # no rates yet, show the stored prices rather than failing the page
+            else:
+                exchange_rate = float(rate.rate)
+
+        # the converted prices come back as item.converted_price, computed by the query
+        page = await async_crud.stream_items(
+            db, limit=limit, search=search, category_id=cat_id, created_by=current_user.user_id,
+            with_suppliers=True, sort=sort, after=after, before=before, currency=currency, min_price=low, max_price=high
+        )
+    except PaginationError as e:
+        await db.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except BaseException:
+        await db.close()
+        raise
+
+    # the category filter lists every category, taken from the in-memory autocomplete index rather than a query per render
+    categories = [{"category_id": entry["id"], "name": entry["name"]} for entry in autocomplete.categories.all()]
+
+    return templating.stream(request, "view_inventory.html", {
         "current_user" : current_user,
-        "items" : items,
-        "prev_page" : prev_page,
-        "next_page" : next_page,
+        "items" : page.items,
         "page" : page,
+        "limit" : limit,
+        "page_sizes" : PAGE_SIZES,
         "search" : search,
         "selected_category" : cat_id,
         "currency" : currency,
         "exchange_rate" : exchange_rate,
+        "sort" : sort,
+        "min_price" : low,
+        "max_price" : high,
         "categories" : categories   
-    })
+    }, on_close=db.close)
 
 @router.post("/inventory/add", response_class=RedirectResponse)
 async def add_inventory_item(
@@ -204,32 +246,28 @@ async def add_inventory_item(
     category: str = Form(...),  
     category_id: str = Form(""),
     supplier: str = Form("", max_length=100),  
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_cookie)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_from_cookie)
 ):
-    
-    if category_id:
-        cat_id = int(category_id)
-    else:
-        
-        existing_cat = db.query(Category).filter(Category.name == category).first()
-        if existing_cat:
-            cat_id = existing_cat.category_id
+    # creating the category (if it's new), the item and its supplier link all happen in one transaction
+    def add_item(session: Session):
+        if category_id:
+            cat_id = int(category_id)
         else:
-           
-            new_cat = crud.create_category(db, schemas.CategoryCreate(name=category, description=""))
-            cat_id = new_cat.category_id
-
-    item_data = schemas.InventoryItemCreate(
-        name=name,
-        description=description,
-        quantity=quantity,
-        price=price,
-        supplier=supplier,
-        category_id=cat_id,
-        created_by=current_user.user_id
-    )
-    crud.create_item(db, item_data)
+            cat_id = crud.get_or_create_category(session, category).category_id
+
+        item_data = schemas.InventoryItemCreate(
+            name=name,
+            description=description,
+            quantity=quantity,
+            price=price,
+            supplier=supplier,
+            category_id=cat_id,
+            created_by=current_user.user_id
+        )
+        crud.create_item(session, item_data)
+
+    await async_crud.run_unit_of_work(db, add_item)
     return RedirectResponse(url="/inventory/manage", status_code=status.HTTP_302_FOUND)
 
 
@@ -243,119 +281,53 @@ async def edit_inventory_item(
     price: float = Form(...),
     category: str = Form(""),  
     category_id: str = Form(...),  
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_cookie)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_from_cookie)
 ):
-    item = crud.get_item_by_user(db, item_id, current_user.user_id)
+    item = await async_crud.get_item_by_user(db, item_id, current_user.user_id)
     if not item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     
-    
-    if category.strip():  
-        
-        existing_cat = db.query(Category).filter(Category.name == category).first()
-        if existing_cat:
-            cat_id = existing_cat.category_id
+    # a newly typed category is created in the same transaction as the item update
+    def edit_item(session: Session):
+        if category.strip():
+            cat_id = crud.get_or_create_category(session, category).category_id
         else:
-            
-            new_cat = crud.create_category(db, schemas.CategoryCreate(name=category, description=""))
-            cat_id = new_cat.category_id
-    else:
-        
-        cat_id = int(category_id)
-    
-    updates = schemas.InventoryItemUpdate(
-        name=name,
-        description=description,
-        quantity=quantity,
-        price=price,
-        category_id=cat_id
-    )
-    crud.update_item(db, item, updates)
+            cat_id = int(category_id)
+
+        updates = schemas.InventoryItemUpdate(
+            name=name,
+            description=description,
+            quantity=quantity,
+            price=price,
+            category_id=cat_id
+        )
+        crud.update_item(session, item, updates)
+
+    await async_crud.run_unit_of_work(db, edit_item)
     return RedirectResponse(url="/inventory/manage", status_code=status.HTTP_302_FOUND)
 
 
 @router.get("/inventory/delete/{item_id}", response_class=RedirectResponse)
 async def delete_inventory_item(
     item_id: int, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user_from_cookie)
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: Principal = Depends(get_current_user_from_cookie)
 ):
-    item = crud.get_item_by_user(db, item_id, current_user.user_id)
+    item = await async_crud.get_item_by_user(db, item_id, current_user.user_id)
     if not item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
-    crud.delete_item(db, item_id)
+    await async_crud.delete_item(db, item_id)
     return RedirectResponse(url="/inventory/manage", status_code=status.HTTP_302_FOUND)
 
 
 # dashboard route
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
-    items = db.query(models.InventoryItem).filter(models.InventoryItem.created_by == current_user.user_id).all()
-
-    # total inventory value
-    total_inventory_value = sum(item.quantity * float(item.price) for item in items)
-
-    # top categories
-    category_data = {} # {'category name': 'count'}
-    for item in items:
-        cat_name = item.category.name if item.category else "uncategorized"
-        category_data[cat_name] = 1 + category_data.get(cat_name, 0)
-
-    category_labels = list(category_data.keys()) # keys aka cat names
-    category_counts = list(category_data.values()) # count
-
-    # price distribution buckets
-    price_ranges = ["0–50", "51–100", "101–200", "201–500", "500+"]
-    price_counts = [0,0,0,0,0]
-    for item in items:
-        p = float(item.price)
-        if p <= 50:
-            price_counts[0] += 1
-        elif p <= 100:
-            price_counts[1] += 1
-        elif p <= 200:
-            price_counts[2] += 1
-        elif p <= 500:
-            price_counts[3] += 1
-        else:
-            price_counts[4] += 1
-
-    # low stock items
-    low_stock_items = [item for item in items if item.quantity < 10] # if item quantity less than 10, the item stock is low
-
-    # supplier overview
-    supplier_names = []
-    for item in items:
-        if item.suppliers: # check if item has suppliers
-            first_supplier = item.suppliers[0] # get first ItemSupplier object in db in that first row
-            supplier = first_supplier.supplier # access the supplier object
-            supplier_name = supplier.name # get the name of the supplier
-            supplier_names.append(supplier_name)
-    
-    unique_suppliers = len(set(supplier_names)) 
-    supplier_counts = {} # {'supplier names' : '# of items each supplier provides'}
-    for s in supplier_names:
-        supplier_counts[s] = 1 + supplier_counts.get(s, 0)
-    
-    top_suppliers = sorted(supplier_counts.items(), key=lambda x: x[1], reverse=True)[:5] # x = ("Supplier Name", item count). Sorts based on the count in the tuple, return top 5 supplier pairs by item count
-    
-    # recently added items
-    recent_items = sorted(items, key=lambda x: x.created_at, reverse=True)[:5]
-
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request,
+async def dashboard(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: Principal = Depends(get_current_user_from_cookie)):
+    # every panel is an aggregate query, see app/dashboard.py
+    dashboard_data = await db.run_sync(dashboard_panels.build, current_user.user_id)
+    return templating.stream(request, "dashboard.html", {
         "current_user": current_user,
-        "total_inventory_value": total_inventory_value,
-        "category_labels" : category_labels,
-        "category_counts" : category_counts,
-        "price_ranges": price_ranges,
-        "price_counts" : price_counts,
-        "low_stock_items": low_stock_items,
-        "recent_items": recent_items,
-        "supplier_overview": {
-            "unique_suppliers": unique_suppliers,
-            "top_suppliers" : top_suppliers
-        }
-    })
\ No newline at end of file
+        **dashboard_data
+    })
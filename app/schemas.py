@@ -1,7 +1,7 @@
-from pydantic import BaseModel, condecimal, Field
+from pydantic import BaseModel, ConfigDict, condecimal, Field, field_validator, model_validator
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Annotated, ForwardRef
+from typing import List, Annotated, ForwardRef, Literal
 
 SupplierRef = ForwardRef("Supplier")
 
@@ -25,8 +25,7 @@ class Category(CategoryBase):
     created_at: datetime
 
     # used so that SQLAlchemy models can be converted to Pydantic objects easily
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
     
 
 # Inventory Item
@@ -43,6 +42,26 @@ class InventoryItemCreate(InventoryItemBase):
     created_by: int 
     supplier: str | None = None
 
+# a row of a bulk import. The category can be given by id or by name; names are resolved (and created) in batch
+class InventoryItemImport(InventoryItemCreate):
+    category_id: int | None = None
+    category: str | None = None
+
+    @model_validator(mode="after")
+    def check_category(self):
+        if self.category_id is None and not (self.category and self.category.strip()):
+            raise ValueError("category or category_id is required")
+        return self
+
+class ItemImportError(BaseModel):
+    row: int # 1-based position of the row in the uploaded file (not counting the CSV header)
+    errors: list[str]
+
+class ItemImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: list[ItemImportError] = []
+
 class InventoryItemUpdate(BaseModel):
     name: str | None = None
     description: str | None = None
@@ -59,8 +78,13 @@ class InventoryItem(InventoryItemBase):
     category: Category
     suppliers: List["Supplier"] = [] 
 
-    class Config:
-        orm_mode = True
+    # the ORM relationship holds ItemSupplier link rows, the response lists the suppliers themselves
+    @field_validator("suppliers", mode="before")
+    @classmethod
+    def unwrap_supplier_links(cls, value):
+        return [getattr(link, "supplier", link) for link in value]
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Supplier
@@ -81,8 +105,7 @@ class Supplier(SupplierBase):
     supplier_id: int
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # User
@@ -102,15 +125,46 @@ class User(UserBase):
     user_id: int
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserPasswordUpdate(BaseModel):
     old_password: str = Field(..., min_length=8, description="Current password")
     new_password: str = Field(..., min_length=8, description="New password to be set")
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+InventoryItem.model_rebuild()
+
+
+# Item batch (POST /items/batch)
+
+class ItemBatchOperation(BaseModel):
+    op: Literal["get", "create", "update", "delete"]
+    item_id: int | None = None # get, update and delete
+    item: InventoryItemCreate | None = None # create
+    updates: InventoryItemUpdate | None = None # update
+
+    @model_validator(mode="after")
+    def check_arguments(self):
+        if self.op in ("get", "update", "delete") and self.item_id is None:
+            raise ValueError(f"{self.op} needs an item_id")
+        if self.op == "create" and self.item is None:
+            raise ValueError("create needs an item")
+        if self.op == "update" and self.updates is None:
+            raise ValueError("update needs updates")
+        return self
+
+class ItemBatch(BaseModel):
+    operations: list[ItemBatchOperation]
+    atomic: bool = True # all the operations in one transaction, or each one applied or failed on its own
+
+class ItemBatchResult(BaseModel):
+    op: str
+    status: int # HTTP status the single item route would have answered with
+    item: InventoryItem | None = None
+    error: str | None = None
 
-InventoryItem.model_rebuild()
\ No newline at end of file
+class ItemBatchReport(BaseModel):
+    committed: bool # False when an atomic batch failed and nothing was applied
+    results: list[ItemBatchResult] # one per operation, in order
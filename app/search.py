@@ -0,0 +1,53 @@
+import re
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, literal_column, or_
+from sqlalchemy.orm import Query, Session
+
+from app.models import InventoryItem
+
+# Full-text search over item name and description.
+# On SQLite this uses the inventory_items_fts FTS5 index (created and kept in sync by triggers in
+# migrations/versions/0004), which gives prefix, multi-term and ranked matching without scanning the table.
+# Other databases fall back to a substring match on name and description.
+
+# The FTS table is kept out of Base.metadata on purpose: it's a virtual table that only the migration should create
+fts_metadata = MetaData()
+inventory_items_fts = Table(
+    "inventory_items_fts",
+    fts_metadata,
+    Column("rowid", Integer), # same value as inventory_items.item_id
+    Column("name", String),
+    Column("description", String),
+    Column("rank", Float), # FTS5 hidden column, bm25 score of the match (lower is better)
+)
+
+# relevance sort key, only meaningful when searching. Labelled so it can be read back from the result rows
+relevance = inventory_items_fts.c.rank.label("relevance")
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+# turns free text into an FTS5 query: every word must match, and the words are treated as prefixes ("blu wid" finds "blue widget")
+def to_match_query(search: str) -> str | None:
+    terms = _TERM.findall(search)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def uses_fts(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+# restricts the items query to those matching the search. Returns the query and whether relevance ranking is available
+def filter_items(db: Session, query: Query, search: str) -> tuple[Query, bool]:
+    if uses_fts(db):
+        match_query = to_match_query(search)
+        if match_query is None:
+            return query.filter(False), False
+        query = query.join(inventory_items_fts, inventory_items_fts.c.rowid == InventoryItem.item_id).filter(
+            literal_column("inventory_items_fts").op("MATCH")(match_query)
+        )
+        return query, True
+
+    pattern = f"%{search}%"
+    return query.filter(or_(InventoryItem.name.ilike(pattern), InventoryItem.description.ilike(pattern))), False
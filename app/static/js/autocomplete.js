@@ -1,21 +1,27 @@
-function autocomplete(categories) {
+// suggestions come from the server's in-memory prefix index (GET /autocomplete/{kind}?q=) instead of a list rendered into the page
+function autocomplete(kind) {
     return {
         query: '',
         selected: null,
-        categories: categories,
+        results: [],
+        timer: null,
+        init() {
+            this.$watch('query', () => this.search());
+            this.search();
+        },
         get filtered() {
-            const results = !this.query 
-                ? this.categories 
-                : this.categories.filter(item => 
-                    item.name.toLowerCase().includes(this.query.toLowerCase())
-                );
-            console.log('Filtered items:', results); // Debug output
-            return results;
+            return this.results;
+        },
+        search() {
+            clearTimeout(this.timer); // wait for a short pause in typing before asking the server
+            this.timer = setTimeout(async () => {
+                const response = await fetch(`/autocomplete/${kind}?q=${encodeURIComponent(this.query)}`);
+                this.results = response.ok ? await response.json() : [];
+            }, 150);
         },
         select(item) {
             this.query = item.name;
             this.selected = item;
-            console.log('Selected item:', item); // Debug output
         }
     }
 }
@@ -28,8 +28,9 @@ document.addEventListener("DOMContentLoaded", function () {
 
     // price buckets
     const priceCtx = document.getElementById('priceChart');
+    let priceChart = null;
     if (priceCtx) {
-        new Chart(priceCtx, {
+        priceChart = new Chart(priceCtx, {
             type: 'bar',
             data: {
                 labels: dashboardData.price_ranges,
@@ -71,4 +72,34 @@ document.addEventListener("DOMContentLoaded", function () {
 
         })
     }
-});
\ No newline at end of file
+
+    // live updates pushed by the server when items change, instead of polling
+    const events = new EventSource("/api/dashboard/stream");
+
+    events.addEventListener("summary", (event) => {
+        const summary = JSON.parse(event.data);
+        const total = document.getElementById("total-inventory-value");
+        if (total) total.textContent = `$${summary.total_value}`;
+        if (priceChart) {
+            priceChart.data.datasets[0].data = summary.price_counts;
+            priceChart.update();
+        }
+    });
+
+    events.addEventListener("low_stock", (event) => {
+        const { low, cleared } = JSON.parse(event.data);
+        const list = document.getElementById("low-stock-list");
+        if (!list) return;
+        cleared.forEach((itemId) => list.querySelector(`[data-item-id="${itemId}"]`)?.remove());
+        low.forEach((item) => {
+            let entry = list.querySelector(`[data-item-id="${item.item_id}"]`);
+            if (!entry) {
+                entry = document.createElement("li");
+                entry.dataset.itemId = item.item_id;
+                entry.className = "text-red-600 text-sm";
+                list.appendChild(entry);
+            }
+            entry.textContent = `🔻 ${item.name} (Qty: ${item.quantity} )`;
+        });
+    });
+});
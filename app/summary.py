@@ -0,0 +1,180 @@
+import argparse
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Iterator
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app import config, dashboard, events
+from app.models import InventoryItem, InventorySummary
+
+# Per-user inventory summary (item count, total value, low stock count, price histogram, per-category counts),
+# stored in inventory_summaries so the dashboard reads one row instead of aggregating the user's items.
+# crud.create_item/update_item/delete_item (and the bulk import) call the hooks below after flushing their change,
+# inside the same transaction, and the row is adjusted by the item's old and new figures. A user without a row yet
+# gets it built from scratch instead. `python -m app.summary` rebuilds rows to fix any drift, e.g. after changing
+# LOW_STOCK_THRESHOLD or writing items outside of crud.
+# Every change is also reported to events.py, which pushes it to the user's open dashboard streams after commit.
+
+# what one item adds to its owner's summary: (quantity, price, category_id)
+Figures = tuple[int, Decimal, int | None]
+
+
+def figures(item) -> Figures:
+    return (item.quantity or 0, Decimal(str(item.price or 0)), item.category_id)
+
+# same buckets as the CASE in dashboard.py
+def price_bucket(price: Decimal) -> int:
+    for index, upper in enumerate(dashboard.PRICE_BUCKET_BOUNDS):
+        if price <= upper:
+            return index
+    return len(dashboard.PRICE_BUCKET_BOUNDS)
+
+
+def _apply(db: Session, user_id: int, added: list[Figures] = (), removed: list[Figures] = ()):
+    deferred_changes = db.info.get("summary_deferred")
+    if deferred_changes is not None:
+        deferred_changes.append((user_id, list(added), list(removed)))
+        return
+    # the caller has already flushed its change, so this transaction holds the write lock and reads the current row
+    summary = db.get(InventorySummary, user_id, with_for_update=True)
+    if summary is None:
+        rebuild(db, user_id) # sees the flushed change, so there's no delta left to apply
+        events.summary_changed(db, user_id, _published(db.get(InventorySummary, user_id)), {})
+        return
+
+    item_count, total_value, low_stock_count = summary.item_count, Decimal(str(summary.total_value)), summary.low_stock_count
+    price_counts = list(summary.price_counts)
+    category_counts = dict(summary.category_counts)
+    for sign, changes in ((1, added), (-1, removed)):
+        for quantity, price, category_id in changes:
+            item_count += sign
+            total_value += sign * quantity * price
+            low_stock_count += sign if quantity < config.LOW_STOCK_THRESHOLD else 0
+            price_counts[price_bucket(price)] += sign
+            key = str(category_id)
+            category_counts[key] = category_counts.get(key, 0) + sign
+            if category_counts[key] <= 0:
+                del category_counts[key]
+
+    delta = {
+        "item_count": item_count - summary.item_count,
+        "total_value": float(total_value - Decimal(str(summary.total_value))),
+        "low_stock_count": low_stock_count - summary.low_stock_count,
+    }
+    summary.item_count = item_count
+    summary.total_value = total_value
+    summary.low_stock_count = low_stock_count
+    # JSON columns only notice reassignment, not in-place changes
+    summary.price_counts = price_counts
+    summary.category_counts = category_counts
+    events.summary_changed(db, user_id, _published(summary), delta)
+
+# the figures sent to dashboard subscribers
+def _published(summary: InventorySummary) -> dict:
+    return {
+        "item_count": summary.item_count,
+        "total_value": float(summary.total_value),
+        "low_stock_count": summary.low_stock_count,
+        "price_counts": list(summary.price_counts),
+        "category_counts": dict(summary.category_counts),
+    }
+
+
+# Within deferred(), the hooks below only collect the changes and each affected user's row is adjusted once on the way
+# out, for writes that change many items one by one (item_batch.py). Changes of a write that fails afterwards have to
+# be removed from the yielded list by the caller (del changes[mark:]), they'd be applied otherwise
+@contextmanager
+def deferred(db: Session) -> Iterator[list]:
+    changes: list[tuple[int, list[Figures], list[Figures]]] = []
+    db.info["summary_deferred"] = changes
+    try:
+        yield changes
+    finally:
+        db.info.pop("summary_deferred", None)
+    by_user: dict[int, tuple[list[Figures], list[Figures]]] = {}
+    for user_id, added, removed in changes:
+        user_added, user_removed = by_user.setdefault(user_id, ([], []))
+        user_added.extend(added)
+        user_removed.extend(removed)
+    for user_id, (added, removed) in by_user.items():
+        _apply(db, user_id, added=added, removed=removed)
+
+
+# Hooks called by crud after flushing the item change
+
+def item_added(db: Session, user_id: int, item: Figures):
+    _apply(db, user_id, added=[item])
+
+def item_removed(db: Session, user_id: int, item: Figures):
+    _apply(db, user_id, removed=[item])
+
+def item_changed(db: Session, user_id: int, before: Figures, after: Figures):
+    if before != after:
+        _apply(db, user_id, added=[after], removed=[before])
+
+def items_added(db: Session, items: list[tuple[int, Figures]]):
+    by_user: dict[int, list[Figures]] = {}
+    for user_id, item in items:
+        by_user.setdefault(user_id, []).append(item)
+    for user_id, added in by_user.items():
+        _apply(db, user_id, added=added)
+
+def user_removed(db: Session, user_id: int):
+    db.query(InventorySummary).filter(InventorySummary.user_id == user_id).delete(synchronize_session=False)
+
+
+# recomputes the summary of one user, or of every user with items, from the items table
+def rebuild(db: Session, user_id: int | None = None) -> int:
+    def scoped(query):
+        return query.filter(InventoryItem.created_by == user_id) if user_id is not None else query
+
+    summaries: dict[int, InventorySummary] = {}
+    if user_id is not None:
+        summaries[user_id] = InventorySummary(
+            user_id=user_id, item_count=0, total_value=0, low_stock_count=0, price_counts=[0] * len(dashboard.PRICE_RANGES), category_counts={}
+        )
+
+    totals = scoped(db.query(
+        InventoryItem.created_by,
+        func.count(InventoryItem.item_id),
+        func.coalesce(func.sum(InventoryItem.quantity * InventoryItem.price), 0),
+        func.coalesce(func.sum(case((InventoryItem.quantity < config.LOW_STOCK_THRESHOLD, 1), else_=0)), 0),
+    )).group_by(InventoryItem.created_by)
+    for owner, item_count, total_value, low_stock_count in totals:
+        summaries[owner] = InventorySummary(
+            user_id=owner, item_count=item_count, total_value=Decimal(str(total_value)), low_stock_count=low_stock_count,
+            price_counts=[0] * len(dashboard.PRICE_RANGES), category_counts={}
+        )
+
+    bucket = dashboard.PRICE_BUCKET.label("bucket")
+    for owner, index, count in scoped(db.query(InventoryItem.created_by, bucket, func.count(InventoryItem.item_id))).group_by(InventoryItem.created_by, bucket):
+        summaries[owner].price_counts[index] = count
+
+    for owner, category_id, count in scoped(db.query(InventoryItem.created_by, InventoryItem.category_id, func.count(InventoryItem.item_id))).group_by(InventoryItem.created_by, InventoryItem.category_id):
+        summaries[owner].category_counts[str(category_id)] = count
+
+    stale = db.query(InventorySummary)
+    if user_id is not None:
+        stale = stale.filter(InventorySummary.user_id == user_id)
+    stale.delete(synchronize_session="fetch")
+    db.flush()
+    db.add_all(summaries.values())
+    db.flush()
+    return len(summaries)
+
+
+# python -m app.summary [--user-id N]
+if __name__ == "__main__":
+    from app import crud
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the materialized inventory summaries from the items table")
+    parser.add_argument("--user-id", type=int, help="only rebuild this user's summary")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        with crud.unit_of_work(db):
+            rebuilt = rebuild(db, args.user_id)
+    print(f"Rebuilt {rebuilt} inventory summaries.")
@@ -0,0 +1,66 @@
+import os
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app import config
+
+# Jinja environments for the HTML routes.
+# Compiled templates are cached on disk (TEMPLATE_CACHE_DIR), so a new worker loads their bytecode instead of
+# compiling every template again. `templates` renders a whole page in memory, stream() sends a page while it is being
+# rendered, from an async environment whose templates can loop over rows as they're fetched (see pagination.stream).
+# The two environments compile templates differently, so each has its own cache files.
+
+TEMPLATE_DIRECTORY = "app/templates"
+_CHUNK_SIZE = 16 * 1024 # bytes of HTML gathered before a chunk is sent
+
+_loader = FileSystemLoader(TEMPLATE_DIRECTORY)
+
+# jinja only creates its default temp directory, a configured one has to exist before the first page is rendered
+if config.TEMPLATE_CACHE_DIR:
+    os.makedirs(config.TEMPLATE_CACHE_DIR, exist_ok=True)
+
+templates = Jinja2Templates(env=Environment(
+    loader=_loader,
+    autoescape=True,
+    auto_reload=config.TEMPLATE_AUTO_RELOAD,
+    bytecode_cache=FileSystemBytecodeCache(config.TEMPLATE_CACHE_DIR, "__jinja2_%s.cache"),
+))
+
+_stream_env = Environment(
+    loader=_loader,
+    autoescape=True,
+    auto_reload=config.TEMPLATE_AUTO_RELOAD,
+    enable_async=True,
+    bytecode_cache=FileSystemBytecodeCache(config.TEMPLATE_CACHE_DIR, "__jinja2_async_%s.cache"),
+)
+
+
+async def _chunks(parts: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    buffer, size = [], 0
+    async for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= _CHUNK_SIZE:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+# renders name with context into a streamed response. on_close runs once the page is done or the client went away,
+# e.g. to close the session the page's rows are read from
+def stream(request: Request, name: str, context: dict, on_close: Callable[[], Awaitable] | None = None) -> StreamingResponse:
+    template = _stream_env.get_template(name)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in _chunks(template.generate_async({"request": request, **context})):
+                yield chunk
+        finally:
+            if on_close is not None:
+                await on_close()
+
+    return StreamingResponse(body(), media_type="text/html; charset=utf-8")
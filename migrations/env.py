@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from app import config as app_config
+from app.database import Base
+from app import models  # noqa: F401  (registers the models on Base.metadata for autogenerate)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+database_url = app_config.DATABASE_URL
+is_sqlite = database_url.startswith("sqlite")
+
+
+# the full-text search table (and the shadow tables FTS5 creates for it) is managed by hand in a migration,
+# so autogenerate must not try to drop it for being missing from the models
+def include_name(name, type_, parent_names) -> bool:
+    if type_ == "table":
+        return not name.startswith("inventory_items_fts")
+    return True
+
+
+def run_migrations_offline() -> None:
+    # emits the SQL to stdout instead of running it (alembic upgrade head --sql)
+    context.configure(
+        url=database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_name=include_name,
+        render_as_batch=is_sqlite,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(database_url)
+    with connectable.connect() as connection:
+        # SQLite can't ALTER most things in place, batch mode recreates the table instead
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=is_sqlite, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
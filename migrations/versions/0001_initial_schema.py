@@ -0,0 +1,83 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Matches the tables that Base.metadata.create_all used to build at startup. Databases created that way
+already have this schema and should be marked as up to date with `alembic stamp 0001` before upgrading.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String()),
+        sa.Column("password", sa.String()),
+        sa.Column("role", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_users_user_id", "users", ["user_id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "categories",
+        sa.Column("category_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_categories_category_id", "categories", ["category_id"])
+    op.create_index("ix_categories_name", "categories", ["name"])
+
+    op.create_table(
+        "suppliers",
+        sa.Column("supplier_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("contact_details", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_suppliers_supplier_id", "suppliers", ["supplier_id"])
+    op.create_index("ix_suppliers_name", "suppliers", ["name"])
+
+    op.create_table(
+        "inventory_items",
+        sa.Column("item_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("description", sa.String()),
+        sa.Column("quantity", sa.Integer()),
+        sa.Column("price", sa.Numeric()),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.category_id"), nullable=False),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_inventory_items_item_id", "inventory_items", ["item_id"])
+    op.create_index("ix_inventory_items_name", "inventory_items", ["name"])
+    op.create_index("ix_inventory_items_description", "inventory_items", ["description"])
+
+    op.create_table(
+        "item_suppliers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("item_id", sa.Integer(), sa.ForeignKey("inventory_items.item_id"), nullable=False),
+        sa.Column("supplier_id", sa.Integer(), sa.ForeignKey("suppliers.supplier_id"), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_item_suppliers_id", "item_suppliers", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("item_suppliers")
+    op.drop_table("inventory_items")
+    op.drop_table("suppliers")
+    op.drop_table("categories")
+    op.drop_table("users")
@@ -0,0 +1,45 @@
+"""composite indexes for the hot inventory queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Every inventory query is scoped to the owning user, so each index leads with created_by:
+  - (created_by, item_id)     per-user listing and pagination in crud.get_items
+  - (created_by, quantity)    low-stock lookups (quantity < 10) in api_dashboard and the dashboard page
+  - (created_by, created_at)  "recently added" ordering on the dashboard
+  - (created_by, category_id) per-category counts on the dashboard
+item_suppliers gets a unique (item_id, supplier_id) index, which also serves item -> supplier joins,
+plus a supplier_id index for the reverse direction.
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_inventory_items_created_by_item_id", "inventory_items", ["created_by", "item_id"])
+    op.create_index("ix_inventory_items_created_by_quantity", "inventory_items", ["created_by", "quantity"])
+    op.create_index("ix_inventory_items_created_by_created_at", "inventory_items", ["created_by", "created_at"])
+    op.create_index("ix_inventory_items_created_by_category_id", "inventory_items", ["created_by", "category_id"])
+
+    # drop duplicate item/supplier links (keeping the oldest) so the unique index can be built
+    op.execute(
+        "DELETE FROM item_suppliers WHERE id NOT IN "
+        "(SELECT MIN(id) FROM item_suppliers GROUP BY item_id, supplier_id)"
+    )
+    op.create_index("uq_item_suppliers_item_id_supplier_id", "item_suppliers", ["item_id", "supplier_id"], unique=True)
+    op.create_index("ix_item_suppliers_supplier_id", "item_suppliers", ["supplier_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_item_suppliers_supplier_id", table_name="item_suppliers")
+    op.drop_index("uq_item_suppliers_item_id_supplier_id", table_name="item_suppliers")
+    op.drop_index("ix_inventory_items_created_by_category_id", table_name="inventory_items")
+    op.drop_index("ix_inventory_items_created_by_created_at", table_name="inventory_items")
+    op.drop_index("ix_inventory_items_created_by_quantity", table_name="inventory_items")
+    op.drop_index("ix_inventory_items_created_by_item_id", table_name="inventory_items")
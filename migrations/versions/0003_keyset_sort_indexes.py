@@ -0,0 +1,30 @@
+"""indexes backing the keyset pagination sorts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Every sort offered by crud.get_items must be readable in index order (SQLite secondary indexes end with the
+rowid, i.e. item_id, which is the tie breaker of each keyset):
+  - item_id     primary key, or (created_by, item_id) per user
+  - name        ix_inventory_items_name, or (created_by, name) per user (added here)
+  - created_at  (created_at) (added here), or (created_by, created_at) per user
+Categories and suppliers sort by their primary key or their existing name index.
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_inventory_items_created_by_name", "inventory_items", ["created_by", "name"])
+    op.create_index("ix_inventory_items_created_at", "inventory_items", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_inventory_items_created_at", table_name="inventory_items")
+    op.drop_index("ix_inventory_items_created_by_name", table_name="inventory_items")
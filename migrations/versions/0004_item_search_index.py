@@ -0,0 +1,59 @@
+"""full-text search index over item name and description
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Creates the inventory_items_fts FTS5 table used by app/search.py. It is an external content table (it stores
+only the index, the text stays in inventory_items) with prefix indexes for 2 and 3 character prefixes, so typed
+prefixes are index lookups too. Triggers keep it in sync on insert, update and delete. SQLite only, other databases
+use the plain substring search.
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE inventory_items_fts USING fts5(
+            name, description,
+            content='inventory_items', content_rowid='item_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER inventory_items_fts_insert AFTER INSERT ON inventory_items BEGIN
+            INSERT INTO inventory_items_fts(rowid, name, description) VALUES (new.item_id, new.name, new.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER inventory_items_fts_delete AFTER DELETE ON inventory_items BEGIN
+            INSERT INTO inventory_items_fts(inventory_items_fts, rowid, name, description) VALUES ('delete', old.item_id, old.name, old.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER inventory_items_fts_update AFTER UPDATE OF name, description ON inventory_items BEGIN
+            INSERT INTO inventory_items_fts(inventory_items_fts, rowid, name, description) VALUES ('delete', old.item_id, old.name, old.description);
+            INSERT INTO inventory_items_fts(rowid, name, description) VALUES (new.item_id, new.name, new.description);
+        END
+    """)
+    # index the rows that already exist
+    op.execute("INSERT INTO inventory_items_fts(inventory_items_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS inventory_items_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS inventory_items_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS inventory_items_fts_insert")
+    op.execute("DROP TABLE IF EXISTS inventory_items_fts")
@@ -0,0 +1,35 @@
+"""per-user inventory summary table
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Creates inventory_summaries, the materialized dashboard figures maintained by app/summary.py. The table starts
+empty: a user's row is built the first time one of their items is written, and until then the dashboard computes
+the figures live. Run `python -m app.summary` after upgrading to build every row up front.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "inventory_summaries",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("item_count", sa.Integer(), nullable=False),
+        sa.Column("total_value", sa.Numeric(), nullable=False),
+        sa.Column("low_stock_count", sa.Integer(), nullable=False),
+        sa.Column("price_counts", sa.JSON(), nullable=False),
+        sa.Column("category_counts", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("inventory_summaries")
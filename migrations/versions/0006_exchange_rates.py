@@ -0,0 +1,34 @@
+"""exchange rates table and per-user price index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+exchange_rates holds the latest rate of every currency against the base currency, refreshed in the background by
+app/currency_utils.py, so crud.get_items can compute converted prices in the query. The (created_by, price) index
+serves sorting by price and converted price ranges, which are rewritten as ranges on price.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "exchange_rates",
+        sa.Column("base", sa.String(), primary_key=True),
+        sa.Column("target", sa.String(), primary_key=True),
+        sa.Column("rate", sa.Numeric(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_inventory_items_created_by_price", "inventory_items", ["created_by", "price"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_inventory_items_created_by_price", table_name="inventory_items")
+    op.drop_table("exchange_rates")
@@ -0,0 +1,32 @@
+"""table version counters
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Creates table_versions, one counter per table that the crud writes bump in the same transaction. The ETags of the
+read endpoints are derived from them (see app/etags.py). Seeded with a row per table, a table without one gets no ETags.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ["inventory_items", "categories", "suppliers"]
+
+
+def upgrade() -> None:
+    table_versions = op.create_table(
+        "table_versions",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(table_versions, [{"table_name": name, "version": 0} for name in VERSIONED_TABLES])
+
+
+def downgrade() -> None:
+    op.drop_table("table_versions")
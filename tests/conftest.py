@@ -0,0 +1,90 @@
+import os
+import re
+import tempfile
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+# the app reads its settings at import, so the test database and credentials are set before anything imports it
+_database_dir = tempfile.mkdtemp(prefix="inventory-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-that-is-long-enough-for-hs256")
+os.environ["GOOGLE_CLIENT_ID"] = "test-client-id"
+os.environ["GOOGLE_CLIENT_SECRET"] = "test-client-secret"
+# a relationship a route forgot to load raises instead of lazy loading, and every response reports its statement count
+os.environ["DB_RAISE_ON_LAZY_LOAD"] = "true"
+os.environ["SQL_PROFILING"] = "true"
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    alembic_config = Config(os.path.join(_ROOT, "alembic.ini"))
+    alembic_config.set_main_option("script_location", os.path.join(_ROOT, "migrations"))
+    command.upgrade(alembic_config, "head")
+
+
+# without the lifespan, so no background exchange rate refresh is started
+@pytest.fixture
+def client() -> TestClient:
+    from app.main import app
+    return TestClient(app)
+
+@pytest.fixture
+def db():
+    from app.database import SessionLocal
+    with SessionLocal() as session:
+        yield session
+
+
+# The tests share one database, so each one works on its own user and category and filters by them
+
+def unique(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+
+@pytest.fixture
+def user(db):
+    from app import crud
+    return crud.create_sso_user(db, username=unique("user"), role="Admin")
+
+@pytest.fixture
+def category(db):
+    from app import crud, schemas
+    return crud.create_category(db, schemas.CategoryCreate(name=unique("category"), description=""))
+
+# a client signed in as user, for the UI and dashboard routes
+@pytest.fixture
+def user_client(client, user) -> TestClient:
+    from app import principals
+    from app.routes.auth import create_access_token
+    client.cookies.set("access_token", create_access_token(principals.token_claims(user), timedelta(minutes=5)))
+    return client
+
+# add_items(count, **fields) inserts count items of user in category, returning their ids
+@pytest.fixture
+def add_items(db, user, category):
+    from app import crud, schemas
+
+    def add(count: int, **fields) -> list[int]:
+        items = [
+            schemas.InventoryItemCreate(**{
+                "name": f"Item {index}", "description": "test item", "quantity": index, "price": Decimal(index) + Decimal("0.50"),
+                "category_id": category.category_id, "created_by": user.user_id, **fields,
+            })
+            for index in range(count)
+        ]
+        with crud.unit_of_work(db):
+            return crud.bulk_create_items(db, items)
+
+    return add
+
+
+# statements the request ran, from its Server-Timing header (see app/profiling.py)
+def query_count(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
@@ -0,0 +1,56 @@
+import asyncio
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from app import config, crud, currency_utils
+
+# Exchange rates (app/currency_utils.py), fetched from a StaticBackend instead of the upstream API
+
+
+class FailingBackend:
+    async def fetch(self, client: httpx.AsyncClient, base: str) -> dict[str, float]:
+        raise httpx.ConnectError("upstream is down")
+
+
+@pytest.fixture
+def rates(monkeypatch):
+    def use(backend):
+        monkeypatch.setattr(currency_utils.provider, "backend", backend)
+    return use
+
+
+def test_store_rates_replaces_the_stored_rates(db, rates):
+    rates(currency_utils.StaticBackend({"CAD": {"USD": 0.5, "EUR": 0.25}}))
+    assert asyncio.run(currency_utils.store_rates("CAD")) == 2
+    assert crud.get_exchange_rate(db, "CAD", "USD").rate == Decimal("0.5")
+
+    rates(currency_utils.StaticBackend({"CAD": {"USD": 0.75}}))
+    assert asyncio.run(currency_utils.store_rates("CAD")) == 1
+    db.expire_all()
+    assert crud.get_exchange_rate(db, "CAD", "USD").rate == Decimal("0.75")
+    assert crud.get_exchange_rate(db, "CAD", "EUR") is None
+
+def test_a_failed_refresh_keeps_the_stored_rates(db, rates):
+    rates(currency_utils.StaticBackend({"CAD": {"USD": 0.5}}))
+    asyncio.run(currency_utils.store_rates("CAD"))
+    rates(FailingBackend())
+    with pytest.raises(httpx.HTTPError):
+        asyncio.run(currency_utils.store_rates("CAD"))
+    db.expire_all()
+    assert crud.get_exchange_rate(db, "CAD", "USD").rate == Decimal("0.5")
+
+def test_fetch_includes_the_base_currency(rates):
+    rates(currency_utils.StaticBackend({"CAD": {"USD": 0.5}}))
+    assert asyncio.run(currency_utils.provider.fetch("CAD")) == {"USD": 0.5, "CAD": 1.0}
+
+def test_a_slow_upstream_times_out(rates, monkeypatch):
+    class SlowBackend:
+        async def fetch(self, client, base):
+            await asyncio.sleep(1)
+            return {}
+    rates(SlowBackend())
+    monkeypatch.setattr(config, "EXCHANGE_RATE_TIMEOUT", 0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(currency_utils.provider.fetch("CAD"))
@@ -0,0 +1,59 @@
+from sqlalchemy import insert
+
+from app import crud, dashboard
+from app.models import ItemSupplier
+from conftest import unique
+
+# Dashboard panels (app/dashboard.py) and the /api/dashboard endpoints
+
+
+def test_low_stock_lists_every_low_stock_item(user_client, add_items):
+    add_items(80) # quantities 0 to 79, 0 to 9 are low
+    add_items(60, quantity=1)
+    response = user_client.get("/api/dashboard/low-stock")
+    assert response.status_code == 200
+    items = response.json()
+    assert len(items) == 70
+    assert [item["quantity"] for item in items] == sorted(item["quantity"] for item in items)
+    assert "x-next-cursor" not in response.headers
+
+def test_low_stock_pages_with_cursors(user_client, add_items):
+    add_items(60, quantity=2)
+    seen, params = [], {"limit": 25}
+    while True:
+        response = user_client.get("/api/dashboard/low-stock", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 25
+        seen += response.json()
+        if "x-next-cursor" not in response.headers:
+            break
+        params = {"limit": 25, "after": response.headers["x-next-cursor"]}
+    assert len(seen) == 60
+
+def test_low_stock_rejects_a_bad_cursor(user_client):
+    assert user_client.get("/api/dashboard/low-stock", params={"after": "nope"}).status_code == 400
+
+def test_supplier_overview_counts_each_items_first_supplier(db, user, add_items):
+    first, second = unique("first"), unique("second")
+    item_ids = add_items(3, supplier=first)
+    extra = crud.get_or_create_suppliers(db, {second})[second]
+    db.execute(insert(ItemSupplier), [{"item_id": item_id, "supplier_id": extra} for item_id in item_ids])
+    db.commit()
+    add_items(1, supplier=second)
+
+    overview = dashboard.supplier_overview(db, user.user_id)
+    assert overview["unique_suppliers"] == 2
+    assert overview["top_suppliers"] == [(first, 3), (second, 1)]
+
+def test_summary_matches_the_items(user_client, add_items):
+    add_items(12) # quantities 0 to 11, prices n + 0.50
+    figures = user_client.get("/api/dashboard/summary").json()
+    assert figures["total_items"] == 12
+    assert figures["low_stock_count"] == 10
+    assert figures["total_inventory_value"] == sum(index * (index + 0.5) for index in range(12))
+
+def test_dashboard_page_renders(user_client, add_items):
+    add_items(3, supplier=unique("supplier"))
+    response = user_client.get("/dashboard")
+    assert response.status_code == 200
+    assert "Item 0" in response.text
@@ -0,0 +1,90 @@
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app import config, google_oauth
+
+# The Google sign in callback against a local stand-in for Google's token and JWKS endpoints (httpx.MockTransport),
+# with ID tokens signed by a throwaway RSA key.
+
+KEY_ID = "test-key"
+_private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _jwks() -> dict:
+    key = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(_private_key.public_key()))
+    return {"keys": [{**key, "kid": KEY_ID, "alg": "RS256", "use": "sig"}]}
+
+def _id_token(**claims) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": config.GOOGLE_ISSUERS[0], "aud": config.GOOGLE_CLIENT_ID, "sub": "1234567890",
+        "email": "ada@example.com", "email_verified": True, "iat": now, "exp": now + 300,
+        **claims,
+    }
+    return jwt.encode(payload, _private_key, algorithm="RS256", headers={"kid": KEY_ID})
+
+
+class FakeGoogle:
+    def __init__(self):
+        self.token_response = httpx.Response(200, json={"id_token": _id_token()})
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url == httpx.URL(config.GOOGLE_TOKEN_URL):
+            return self.token_response
+        if request.url == httpx.URL(config.GOOGLE_JWKS_URL):
+            return httpx.Response(200, json=_jwks())
+        return httpx.Response(404)
+
+
+# the module's client pointed at the stand-in, with an empty key cache
+@pytest.fixture
+def google(monkeypatch) -> FakeGoogle:
+    fake = FakeGoogle()
+    oauth_client = google_oauth.GoogleOAuthClient()
+    oauth_client._client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    monkeypatch.setattr(google_oauth, "client", oauth_client)
+    monkeypatch.setattr("app.routes.oauth.google", oauth_client)
+    return fake
+
+
+def test_callback_signs_in_with_a_verified_id_token(client, google):
+    response = client.get("/auth/google/callback", params={"code": "good-code"}, follow_redirects=False)
+
+    assert response.status_code == 307
+    assert response.headers["location"] == "/profile"
+    assert response.cookies.get("access_token")
+    token_request = google.requests[0]
+    assert token_request.url == httpx.URL(config.GOOGLE_TOKEN_URL)
+    assert b"code=good-code" in token_request.content
+
+def test_callback_rejects_a_token_for_another_audience(client, google):
+    google.token_response = httpx.Response(200, json={"id_token": _id_token(aud="someone-else")})
+
+    response = client.get("/auth/google/callback", params={"code": "code"}, follow_redirects=False)
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid ID token")
+    assert "access_token" not in response.cookies
+
+def test_callback_rejects_an_unverified_email(client, google):
+    google.token_response = httpx.Response(200, json={"id_token": _id_token(email_verified=False)})
+
+    response = client.get("/auth/google/callback", params={"code": "code"}, follow_redirects=False)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Google account has no verified email"
+
+def test_callback_rejects_a_token_response_that_is_not_json(client, google):
+    google.token_response = httpx.Response(200, text="<html>oops</html>")
+
+    response = client.get("/auth/google/callback", params={"code": "code"}, follow_redirects=False)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Failed to exchange code for token"
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from app import crud, schemas
+from app.models import ItemSupplier
+from conftest import query_count
+
+# Relationship loading (DB_RAISE_ON_LAZY_LOAD is on for the tests, see conftest.py): the item reads and writes run a
+# fixed number of statements whatever the page size, and nothing falls back to a lazy load per row.
+
+
+def test_a_missed_loading_plan_raises(db, add_items):
+    item_id, = add_items(1)
+    db.expire_all()
+    item = crud.get_item(db, item_id)
+    with pytest.raises(InvalidRequestError):
+        item.suppliers
+
+def test_orm_items_with_their_loading_plan_serialize_without_lazy_loads(db, add_items, category):
+    add_items(20, supplier="Acme")
+    db.expire_all()
+    page = crud.get_items(db, limit=20, category_id=category.category_id, options=crud.LOAD_FULL)
+    items = [schemas.InventoryItem.model_validate(item, from_attributes=True) for item in page.items]
+    assert len(items) == 20
+    assert all(item.suppliers[0].name == "Acme" for item in items)
+
+def test_a_page_of_100_items_takes_a_few_statements(client, add_items, category):
+    add_items(150, supplier="Acme")
+    response = client.get("/items/", params={"category_id": category.category_id, "limit": 100})
+    assert response.status_code == 200
+    assert len(response.json()) == 100
+    # the ETag's table versions, the items with their category, their suppliers
+    assert query_count(response) <= 3
+
+    response = client.get("/items/", params={"category_id": category.category_id, "limit": 10})
+    assert query_count(response) <= 3
+
+def test_reading_an_item_takes_a_few_statements(client, add_items):
+    item_id, = add_items(1, supplier="Acme")
+    response = client.get(f"/items/{item_id}")
+    assert response.status_code == 200
+    assert response.json()["suppliers"][0]["name"] == "Acme"
+    assert query_count(response) <= 3
+
+def test_delete_item_loads_the_supplier_links_it_cascades_to(db, add_items):
+    item_id, = add_items(1, supplier="Acme")
+    db.expire_all()
+    assert crud.delete_item(db, item_id) is not None
+    assert crud.get_item(db, item_id) is None
+    assert db.query(ItemSupplier).filter(ItemSupplier.item_id == item_id).count() == 0
+
+def test_deleting_through_the_api(client, add_items):
+    item_id, = add_items(1, supplier="Acme")
+    response = client.delete(f"/items/{item_id}")
+    assert response.status_code == 200
+    # the item with its relations, then the delete with its summary, autocomplete and ETag upkeep, transaction control included
+    assert query_count(response) <= 12
+    assert response.json()["suppliers"][0]["name"] == "Acme"
+    assert client.get(f"/items/{item_id}").status_code == 404
@@ -0,0 +1,84 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, schemas
+from app.database import SessionLocal, engine
+from app.models import Category
+from conftest import unique
+
+# Units of work (crud.unit_of_work): one commit for the whole block, savepoints for nested blocks, and SQLite write
+# transactions that take the write lock up front while plain reads stay deferred.
+
+
+@contextmanager
+def transaction_statements():
+    statements = []
+    listener = lambda _conn, _cursor, statement, *_args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+def _begins(statements):
+    return [statement for statement in statements if statement.startswith("BEGIN")]
+
+
+def test_reads_begin_deferred_and_units_of_work_immediate():
+    with SessionLocal() as db, transaction_statements() as statements:
+        crud.get_category(db, 1)
+        db.rollback()
+        crud.create_category(db, schemas.CategoryCreate(name=unique("category")))
+    assert _begins(statements) == ["BEGIN", "BEGIN IMMEDIATE"]
+
+def test_a_read_before_a_write_is_restarted_as_a_write_transaction():
+    with SessionLocal() as db, transaction_statements() as statements:
+        crud.get_category(db, 1)
+        crud.create_category(db, schemas.CategoryCreate(name=unique("category")))
+    assert _begins(statements) == ["BEGIN", "BEGIN IMMEDIATE"]
+
+def test_a_read_then_write_survives_a_commit_in_between():
+    with SessionLocal() as db:
+        crud.get_category(db, 1) # pins a read snapshot
+        other = threading.Thread(target=lambda: _create_category(unique("other")))
+        other.start()
+        other.join()
+        category = crud.create_category(db, schemas.CategoryCreate(name=unique("mine")))
+        assert category.category_id is not None
+
+def _create_category(name: str):
+    with SessionLocal() as db:
+        crud.create_category(db, schemas.CategoryCreate(name=name))
+
+# a read holding SQLite's write lock would make the writer wait busy_timeout and then fail
+def test_an_open_read_does_not_block_a_writer():
+    with SessionLocal() as reader:
+        crud.get_category(reader, 1)
+        _create_category(unique("category"))
+
+def test_a_unit_of_work_commits_once_and_rolls_back_everything_on_failure(db):
+    names = [unique("category"), unique("category")]
+    with pytest.raises(RuntimeError):
+        with crud.unit_of_work(db):
+            crud.create_category(db, schemas.CategoryCreate(name=names[0]))
+            raise RuntimeError("boom")
+    assert db.query(Category).filter(Category.name == names[0]).count() == 0
+
+    with crud.unit_of_work(db):
+        crud.create_category(db, schemas.CategoryCreate(name=names[0]))
+        crud.create_category(db, schemas.CategoryCreate(name=names[1]))
+    assert db.query(Category).filter(Category.name.in_(names)).count() == 2
+
+def test_a_failed_nested_unit_of_work_only_rolls_back_its_savepoint(db):
+    kept, dropped = unique("kept"), unique("dropped")
+    with crud.unit_of_work(db):
+        crud.create_category(db, schemas.CategoryCreate(name=kept))
+        with pytest.raises(RuntimeError):
+            with crud.unit_of_work(db):
+                crud.create_category(db, schemas.CategoryCreate(name=dropped))
+                raise RuntimeError("boom")
+    assert db.query(Category).filter(Category.name == kept).count() == 1
+    assert db.query(Category).filter(Category.name == dropped).count() == 0